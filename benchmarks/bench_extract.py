@@ -0,0 +1,76 @@
+"""Micro-benchmark: compiled field extraction vs. the old nested .get chains.
+
+    python benchmarks/bench_extract.py [n_articles]
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import xmltodict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synth import generate
+from utility.extract import extract_citation, month_map
+
+
+def legacy_extract(pubarticle):
+    """Field extraction as Parser.select_info_to_obj did it before utility.extract."""
+    info = pubarticle.get('MedlineCitation', {})
+    pmid = info.get('PMID', {}).get('#text')
+    pmid = int(pmid) if pmid else 0
+    journal = info.get('Article', {}).get('Journal', {}).get('Title')
+    issue = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Issue')
+    volume = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Volume')
+    pubyear = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Year')
+    month = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Month')
+    pubday = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Day')
+    pubmonth = month_map.get(month)
+    title = info.get('Article', {}).get('ArticleTitle')
+    if type(title) == dict:
+        title = title.get('#text')
+    page = info.get('Article', {}).get('Pagination', {}).get('MedlinePgn')
+    abstract = info.get('Article', {}).get('Abstract', {}).get('AbstractText')
+    if type(abstract) == list:
+        abstract = ' '.join([x.get('#text', str(x)) for x in abstract if type(x) == dict])
+    elif type(abstract) == dict:
+        abstract = abstract.get('#text')
+    author = info.get('Article', {}).get('AuthorList', {}).get('Author', [{}])
+    if type(author) == list:
+        if len(author) > 0:
+            author = author[0].get('Initials')
+    elif type(author) == dict:
+        author = author.get('Initials')
+    language = info.get('Article', {}).get('Language', '')
+    if type(language) == list:
+        language = ','.join(language)
+    return dict(pmid=pmid, journal=journal, issue=issue, volume=volume, pubyear=pubyear, pubmonth=pubmonth,
+                pubday=pubday, title=title, page=page, abstract=abstract, author=author, language=language)
+
+
+def measure(func, articles, repeat=3):
+    best = None
+    for _ in range(repeat):
+        ts = time.perf_counter()
+        for x in articles:
+            func(x)
+        elapsed = time.perf_counter() - ts
+        best = elapsed if best is None else min(best, elapsed)
+    return len(articles) / best
+
+
+def main(n=20000):
+    with tempfile.NamedTemporaryFile(suffix='.xml.gz') as f:
+        generate(f.name, n)
+        with gzip.open(f.name) as xml:
+            articles = xmltodict.parse(xml)['PubmedArticleSet']['PubmedArticle']
+    assert all(legacy_extract(x) == extract_citation(x['MedlineCitation']) for x in articles[:100])
+    before = measure(legacy_extract, articles)
+    after = measure(lambda x: extract_citation(x['MedlineCitation']), articles)
+    print(f'legacy   {before:12.0f} articles/s')
+    print(f'compiled {after:12.0f} articles/s  ({after / before:.2f}x)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
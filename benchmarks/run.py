@@ -0,0 +1,167 @@
+"""End-to-end and per-stage benchmarks for core's Parser and utility/pmparser.py.
+
+    python benchmarks/run.py --sizes 1000 10000 100000 --output bench.json
+    python benchmarks/run.py --sizes 1000 --compare bench.json
+
+Every (case, size) pair runs in a fresh interpreter inside a scratch
+directory, so peak RSS and the SQLite files belong to that run alone.
+Input files come from benchmarks/synth.py with a fixed seed, which keeps
+results from different commits comparable.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synth import generate
+from utility.decompress import BACKEND as GZIP_BACKEND, open_xml
+from utility.metrics import FileMetrics, MeteredReader, peak_rss
+from utility.xmlstream import element_to_dict, iter_elements
+
+CASES = ('parser', 'pmparse', 'pmparse-stages')
+
+
+def bench_parser(path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pubmed.settings')
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.DATABASES['default']['NAME'] = os.path.abspath('bench.sqlite3')
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    from core.management.commands.parse_xml import Parser
+
+    ts = time.perf_counter()
+    p = Parser(path)
+    p.parse()
+    wall = time.perf_counter() - ts
+    return p.metrics.to_dict(articles=p.count, rows=p.saved, wall=round(wall, 4))
+
+
+def bench_pmparse(path):
+    from utility.pmparser import Pmparse
+    indir = os.path.abspath('in')
+    os.makedirs(indir)
+    shutil.copy(path, indir)
+    ts = time.perf_counter()
+    Pmparse(indir, dbfile='bench.sqlite3', process=1)
+    wall = time.perf_counter() - ts
+    conn = sqlite3.connect('bench.sqlite3')
+    rows = conn.execute('select count(*) from pubmed').fetchone()[0]
+    conn.close()
+    # Parsing happens in pool workers, so count the largest child too
+    rss = max(peak_rss(), resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {'file': os.path.basename(path), 'wall': round(wall, 4), 'peak_rss_kb': rss,
+            'rows': rows, 'stages': {}}
+
+
+def bench_pmparse_stages(path):
+    """Pmparse's steps called one by one in-process, timed as metrics stages."""
+    from utility.pmparser import Pmparse, SqliteOutput
+    metrics = FileMetrics(os.path.basename(path))
+    pm = Pmparse.__new__(Pmparse)
+    out = SqliteOutput('bench.sqlite3')
+    ts = time.perf_counter()
+    # The same pipeline as Pmparse.parse_to_db, each generator timed as its own stage
+    with open_xml(path) as f:
+        elems = iter_elements(MeteredReader(f, metrics))
+        articles = metrics.iter('parse', (element_to_dict(x) for x in elems if x.tag == 'PubmedArticle'))
+        rows = metrics.iter('extract', (x.to_iter() for x in pm.extract_articles(articles)))
+        with metrics.stage('insert'):
+            out.to_db(rows, os.path.basename(path))
+    count = metrics.stages['extract']['items']
+    metrics.add('insert', rows=count)
+    wall = time.perf_counter() - ts
+    out.close()
+    return metrics.to_dict(articles=count, rows=count, wall=round(wall, 4))
+
+
+def run_case(case, path):
+    """Run one case in a child interpreter and return its result dict."""
+    workdir = tempfile.mkdtemp(prefix=f'bench-{case}-')
+    try:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', case, path],
+                             cwd=workdir, stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarise(result):
+    wall = result['wall'] or float('nan')
+    result['articles_per_sec'] = round(result['articles'] / wall, 1)
+    result['rows_per_sec'] = round(result['rows'] / wall, 1)
+    return result
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = {(x['case'], x['articles']): x for x in json.load(f)['results']}
+    print(f'{"case":16} {"articles":>9} {"articles/s":>12} {"old":>12} {"ratio":>7} {"rss MB":>8} {"old":>8}')
+    for x in results:
+        before = old.get((x['case'], x['articles']))
+        if before is None:
+            continue
+        print(f'{x["case"]:16} {x["articles"]:>9} {x["articles_per_sec"]:>12} {before["articles_per_sec"]:>12} '
+              f'{x["articles_per_sec"] / before["articles_per_sec"]:>7.2f} '
+              f'{x["peak_rss_kb"] / 1024:>8.1f} {before["peak_rss_kb"] / 1024:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', default=None, help='Earlier --output file to compare against')
+    parser.add_argument('--case', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('file', nargs='?', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        bench = {'parser': bench_parser, 'pmparse': bench_pmparse, 'pmparse-stages': bench_pmparse_stages}
+        print(json.dumps(bench[args.case](args.file)))
+        return
+
+    datadir = tempfile.mkdtemp(prefix='bench-data-')
+    results = []
+    try:
+        for size in args.sizes:
+            path = generate(os.path.join(datadir, f'pubmed_synth_{size}.xml.gz'), size, seed=args.seed)
+            for case in args.cases:
+                result = run_case(case, path)
+                result.update(case=case, articles=size, input_bytes=os.path.getsize(path))
+                results.append(summarise(result))
+                print(f'{case:16} {size:>9} articles  {result["articles_per_sec"]:>10} articles/s  '
+                      f'{result["peak_rss_kb"] / 1024:>8.1f} MB peak', file=sys.stderr)
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    meta = {'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+            'seed': args.seed, 'gzip': GZIP_BACKEND, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
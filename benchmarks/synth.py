@@ -0,0 +1,139 @@
+"""Deterministic synthetic PubmedArticleSet generator.
+
+    python benchmarks/synth.py out.xml.gz --articles 10000 [--seed 0]
+
+The same (articles, seed) always gives byte-identical XML. The mix covers
+the shapes the extractors have to handle: structured and plain abstracts,
+missing abstracts, single and list authors, MedlineDate instead of
+Year/Month, list languages, and a few duplicated pmids.
+"""
+import argparse
+import gzip
+import io
+import random
+from xml.sax.saxutils import escape
+
+HEADER = ('<?xml version="1.0" ?>\n'
+          '<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2019//EN" '
+          '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_190101.dtd">\n'
+          '<PubmedArticleSet>\n')
+FOOTER = '</PubmedArticleSet>\n'
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+LANGUAGES = ('eng', 'eng', 'eng', 'eng', 'ger', 'fre', 'chi', 'jpn', 'spa', 'rus')
+LABELS = ('BACKGROUND', 'OBJECTIVE', 'METHODS', 'RESULTS', 'CONCLUSIONS')
+JOURNALS = ('Nature', 'Science', 'The Journal of biological chemistry', 'PloS one',
+            'Proceedings of the National Academy of Sciences of the United States of America',
+            'Nucleic acids research', 'Cancer research', 'BMC bioinformatics')
+LAST_NAMES = ('Smith', 'Wang', 'Li', 'Zhang', 'Müller', 'García', 'Kim', 'Nguyen', 'Rossi', 'Tanaka')
+FORE_NAMES = ('John', 'Wei', 'Maria', 'Hans', 'Yuki', 'Anna', 'Ji-Hoon', 'Pierre', 'Elena', 'Omar')
+WORDS = ('cell', 'protein', 'expression', 'gene', 'patients', 'cancer', 'analysis', 'tumor', 'mice',
+         'receptor', 'activity', 'binding', 'sequence', 'clinical', 'signaling', 'mutation', 'therapy',
+         'response', 'pathway', 'treatment', 'growth', 'factor', 'levels', 'induced', 'human')
+MESH = ('Humans', 'Animals', 'Mice', 'Female', 'Male', 'Adult', 'Neoplasms', 'Signal Transduction',
+        'Gene Expression Regulation', 'Cell Line, Tumor', 'Mutation', 'Middle Aged', 'Aged')
+
+
+def sentence(rng, low=8, high=25):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def pub_date(rng):
+    if rng.random() < 0.03:
+        year = rng.randint(1950, 2018)
+        return f'<MedlineDate>{year} {rng.choice(MONTHS)}-{year + 1} {rng.choice(MONTHS)}</MedlineDate>'
+    date = f'<Year>{rng.randint(1950, 2019)}</Year>'
+    if rng.random() < 0.9:
+        date += f'<Month>{rng.choice(MONTHS)}</Month>'
+        if rng.random() < 0.5:
+            date += f'<Day>{rng.randint(1, 28):02d}</Day>'
+    return date
+
+
+def abstract(rng):
+    roll = rng.random()
+    if roll < 0.15:
+        return ''
+    if roll < 0.4:
+        parts = ''.join(f'<AbstractText Label="{label}" NlmCategory="{label}">'
+                        f'{escape(" ".join(sentence(rng) for _ in range(rng.randint(1, 3))))}</AbstractText>'
+                        for label in LABELS[:rng.randint(2, len(LABELS))])
+    else:
+        parts = f'<AbstractText>{" ".join(sentence(rng) for _ in range(rng.randint(3, 10)))}</AbstractText>'
+    return f'<Abstract>{parts}</Abstract>'
+
+
+def authors(rng):
+    count = rng.choice((0, 1, 1, 2, 3, 4, 6, 8, 12))
+    if not count:
+        return ''
+    items = []
+    for _ in range(count):
+        last, fore = rng.choice(LAST_NAMES), rng.choice(FORE_NAMES)
+        items.append(f'<Author ValidYN="Y"><LastName>{last}</LastName><ForeName>{fore}</ForeName>'
+                     f'<Initials>{fore[0]}</Initials><AffiliationInfo><Affiliation>Department of '
+                     f'{rng.choice(WORDS).capitalize()}, University {rng.randint(1, 500)}.</Affiliation>'
+                     f'</AffiliationInfo></Author>')
+    return f'<AuthorList CompleteYN="Y">{"".join(items)}</AuthorList>'
+
+
+def language(rng):
+    if rng.random() < 0.02:
+        return ''.join(f'<Language>{x}</Language>' for x in rng.sample(LANGUAGES[4:], 2))
+    return f'<Language>{rng.choice(LANGUAGES)}</Language>'
+
+
+def mesh(rng):
+    headings = rng.sample(MESH, rng.randint(0, 6))
+    if not headings:
+        return ''
+    items = ''.join(f'<MeshHeading><DescriptorName UI="D{MESH.index(x):06d}" MajorTopicYN="N">{x}'
+                    f'</DescriptorName></MeshHeading>' for x in headings)
+    return f'<MeshHeadingList>{items}</MeshHeadingList>'
+
+
+def keywords(rng):
+    words = rng.sample(WORDS, rng.randint(0, 4))
+    if not words:
+        return ''
+    items = ''.join(f'<Keyword MajorTopicYN="N">{x}</Keyword>' for x in words)
+    return f'<KeywordList Owner="NOTNLM">{items}</KeywordList>'
+
+
+def article(rng, pmid):
+    return (f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM">'
+            f'<PMID Version="1">{pmid}</PMID>'
+            f'<Article PubModel="Print"><Journal><ISSN IssnType="Print">{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}</ISSN>'
+            f'<JournalIssue CitedMedium="Print"><Volume>{rng.randint(1, 300)}</Volume><Issue>{rng.randint(1, 12)}</Issue>'
+            f'<PubDate>{pub_date(rng)}</PubDate></JournalIssue><Title>{escape(rng.choice(JOURNALS))}</Title></Journal>'
+            f'<ArticleTitle>{sentence(rng, 5, 15)}</ArticleTitle>'
+            f'<Pagination><MedlinePgn>{rng.randint(1, 900)}-{rng.randint(901, 999)}</MedlinePgn></Pagination>'
+            f'{abstract(rng)}{authors(rng)}{language(rng)}</Article>'
+            f'{mesh(rng)}{keywords(rng)}</MedlineCitation></PubmedArticle>\n')
+
+
+def generate(path, articles, seed=0, start=1, dup_rate=0.001):
+    """Write a gzip PubmedArticleSet with `articles` records to path."""
+    rng = random.Random(seed)
+    # No name and mtime=0 in the gzip header keep the file md5 reproducible
+    with open(path, 'wb') as raw, \
+            io.TextIOWrapper(gzip.GzipFile('', 'wb', fileobj=raw, mtime=0), encoding='utf-8') as f:
+        f.write(HEADER)
+        for i in range(articles):
+            pmid = start + i
+            if i and rng.random() < dup_rate:
+                pmid = start + rng.randrange(i)
+            f.write(article(rng, pmid))
+        f.write(FOOTER)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=1, help='First pmid')
+    args = parser.parse_args()
+    generate(args.output, args.articles, seed=args.seed, start=args.start)
@@ -0,0 +1,79 @@
+"""Backend-aware bulk writes for the ingest path.
+
+On SQLite rows go in with executemany, the fastest way into a single
+file. On PostgreSQL they are streamed with COPY FROM STDIN, about an order
+of magnitude faster than multi-row INSERTs; upserts COPY into a temporary
+staging table and merge it with INSERT ... ON CONFLICT in one statement.
+Both psycopg 3 and psycopg2 are supported.
+"""
+import io
+
+from django.db import connection
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def columns(model, fields):
+    return [model._meta.get_field(x).column for x in fields]
+
+
+def copy_text(value):
+    """One value in COPY's text format, for psycopg2's file-based copy_expert."""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(cursor, table, names, rows):
+    qn = connection.ops.quote_name
+    sql = f'COPY {qn(table)} ({", ".join(qn(x) for x in names)}) FROM STDIN'
+    raw = cursor.cursor
+    if hasattr(raw, 'copy'):
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(map(copy_text, row)) + '\n')
+        buf.seek(0)
+        raw.copy_expert(sql, buf)
+
+
+def insert_rows(model, fields, rows):
+    """Insert plain tuples into model's table; building model instances costs ~10x the SQL here."""
+    names = columns(model, fields)
+    with connection.cursor() as cursor:
+        if is_postgresql():
+            copy_rows(cursor, model._meta.db_table, names, rows)
+            return
+        qn = connection.ops.quote_name
+        values = ', '.join(['%s'] * len(names))
+        cursor.executemany(f'INSERT INTO {qn(model._meta.db_table)} ({", ".join(map(qn, names))}) '
+                           f'VALUES ({values})', rows)
+
+
+def copy_upsert(model, fields, rows, unique):
+    """PostgreSQL upsert of tuples in `fields` order through a staging table.
+
+    Returns {unique value: pk} of every row. Run it inside a transaction;
+    the staging table is private to the connection and emptied per call.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    staging = qn(model._meta.db_table + '_staging')
+    names = columns(model, fields)
+    key = model._meta.get_field(unique).column
+    cols = ', '.join(map(qn, names))
+    updates = ', '.join(f'{qn(x)} = EXCLUDED.{qn(x)}' for x in names if x != key)
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT {cols} FROM {table} WITH NO DATA')
+        cursor.execute(f'TRUNCATE {staging}')
+        copy_rows(cursor, model._meta.db_table + '_staging', names, rows)
+        cursor.execute(f'INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} '
+                       f'ON CONFLICT ({qn(key)}) DO UPDATE SET {updates} '
+                       f'RETURNING {qn(key)}, {qn(model._meta.pk.column)}')
+        return dict(cursor.fetchall())
@@ -0,0 +1,56 @@
+"""Secondary indexes on core_article that can be deferred around a bulk load.
+
+The indexes in Article.Meta serve the API filters and update_none_field.
+Every insert has to update each of them, so for a large load it is much
+cheaper to drop_indexes() first and create_indexes() once the rows are in.
+Together with the full-text triggers (core.search) that's what
+`parse_pubmed --defer-indexes` does. The unique pmid index stays, since
+the upsert needs it.
+"""
+import logging
+
+from django.db import connection
+
+from . import search
+from .models import Article
+
+logger = logging.getLogger('pubmed')
+
+
+def existing():
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, Article._meta.db_table))
+
+
+def drop_indexes():
+    names = existing()
+    with connection.schema_editor() as editor:
+        for index in Article._meta.indexes:
+            if index.name in names:
+                editor.remove_index(Article, index)
+                logger.info(f'Dropped index {index.name}')
+
+
+def create_indexes():
+    names = existing()
+    with connection.schema_editor() as editor:
+        for index in Article._meta.indexes:
+            if index.name not in names:
+                editor.add_index(Article, index)
+                logger.info(f'Created index {index.name}')
+
+
+def defer():
+    """Drop the secondary indexes and, on SQLite, the full-text triggers."""
+    drop_indexes()
+    if connection.vendor == 'sqlite':
+        search.drop_triggers()
+
+
+def restore():
+    """Undo defer(): build the indexes and re-index full text in one pass each."""
+    create_indexes()
+    if connection.vendor == 'sqlite':
+        search.rebuild()
+        search.create_triggers()
+        logger.info('Full-text index rebuilt')
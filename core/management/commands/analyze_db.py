@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.models import Article
+import datetime
+import logging
+
+logger = logging.getLogger('pubmed')
+
+
+class Command(BaseCommand):
+    help = "Refresh planner statistics and show the query plan of the common article queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-analyze', action='store_true', help='Only print the query plans')
+
+    def queries(self):
+        sample = Article.objects.only('journal', 'language', 'pubdate').first()
+        journal = sample.journal if sample else ''
+        language = sample.language if sample else 'eng'
+        pubdate = sample.pubdate if sample else datetime.date(2000, 1, 1)
+        date_to = pubdate + datetime.timedelta(days=365)
+        articles = Article.objects.order_by('pmid')
+        return (
+            ('lookup by pmid', Article.objects.filter(pmid=1)),
+            ('batch lookup', Article.objects.filter(pmid__in=[1, 2, 3])),
+            ('journal + date range', articles.filter(journal=journal, pubdate__gte=pubdate,
+                                                     pubdate__lte=date_to)[:100]),
+            ('date range', articles.filter(pubdate__gte=pubdate, pubdate__lte=date_to)[:100]),
+            ('language', articles.filter(language=language)[:100]),
+            ('missing abstract backfill', Article.objects.filter(pmid__in=[1, 2, 3], abstract__isnull=True)),
+        )
+
+    def handle(self, *args, **options):
+        if not options['no_analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            logger.info('ANALYZE done')
+        for name, queryset in self.queries():
+            plan = queryset.explain()
+            self.stdout.write(f'-- {name}\n{plan}\n')
+            if connection.vendor == 'sqlite' and 'SCAN core_article\n' in plan + '\n':
+                logger.warning(f'{name}: full table scan')
@@ -0,0 +1,133 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Article
+import csv
+import gzip
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('pubmed')
+
+FIELDS = ('pmid', 'journal', 'pubdate', 'volume', 'issue', 'title', 'abstract', 'page', 'author', 'language')
+
+
+class JsonlWriter(object):
+    suffix = '.jsonl.gz'
+
+    def __init__(self, path, chunk_size):
+        self.f = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, row):
+        record = dict(zip(FIELDS, row))
+        record['pubdate'] = record['pubdate'].isoformat()
+        self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.f.close()
+
+
+class CsvWriter(object):
+    suffix = '.csv'
+
+    def __init__(self, path, chunk_size):
+        self.f = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(FIELDS)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetWriter(object):
+    """Buffer chunk_size rows per column, then write them out as one row group."""
+    suffix = '.parquet'
+
+    def __init__(self, path, chunk_size):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            ('pmid', pa.int32()), ('journal', pa.string()), ('pubdate', pa.date32()),
+            ('volume', pa.string()), ('issue', pa.string()), ('title', pa.string()),
+            ('abstract', pa.string()), ('page', pa.string()), ('author', pa.string()),
+            ('language', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self.chunk_size = chunk_size
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            columns = [list(x) for x in zip(*self.rows)]
+            self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+class Command(BaseCommand):
+    help = "Export articles to Parquet, gzip JSONL or CSV files, one per publication year"
+
+    def add_arguments(self, parser):
+        parser.add_argument('outdir', type=str)
+        parser.add_argument('--format', choices=WRITERS, default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows fetched from the DB per round trip, and rows per Parquet row group')
+        parser.add_argument('--no-shard', action='store_true', help='Write a single articles.<ext> file')
+
+    def handle(self, *args, **options):
+        writer_class = WRITERS[options['format']]
+        if writer_class is ParquetWriter:
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise CommandError('Parquet export needs pyarrow: pip install pyarrow')
+        outdir = options['outdir']
+        chunk_size = options['chunk_size']
+        shard = not options['no_shard']
+        os.makedirs(outdir, exist_ok=True)
+
+        # Walking the pubdate index hands rows over one year after another, so
+        # only one shard is open at a time and memory is bounded by chunk_size
+        rows = Article.objects.order_by('pubdate', 'id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+        ts = time.time()
+        writer, key, count, total = None, None, 0, 0
+        try:
+            for row in rows:
+                year = row[2].year if shard else None
+                if writer is None or year != key:
+                    if writer is not None:
+                        writer.close()
+                        logger.info(f'{self.name_for(key)}{writer.suffix}: {count} articles')
+                    key, count = year, 0
+                    writer = writer_class(os.path.join(outdir, self.name_for(key) + writer_class.suffix),
+                                          chunk_size)
+                writer.write(row)
+                count += 1
+                total += 1
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            logger.info(f'{self.name_for(key)}{writer.suffix}: {count} articles')
+        elapsed = time.time() - ts
+        logger.info(f'Exported {total} articles to {outdir} in {round(elapsed, 2)}s, '
+                    f'{round(total / elapsed if elapsed else 0, 1)} articles/s')
+
+    @staticmethod
+    def name_for(year):
+        return 'articles' if year is None else f'articles_{year}'
@@ -1,6 +1,12 @@
 from django.core.management.base import BaseCommand, CommandError
-from .parse_xml import Parser
+from django.db import connections
+from .parse_xml import Parser, Related, extract_file, STAGES
+from core import indexes
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
 import logging
+import time
 from django.conf import settings
 
 logger = logging.getLogger('pubmed')
@@ -11,12 +17,96 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('file', nargs='+', type=str)
         parser.add_argument('--force', action='store_true', help='Force parse file, delete exists info from db')
-    
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes that decompress, parse and extract files; '
+                                 'the main process stays the only DB writer')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Articles inserted per transaction')
+        parser.add_argument('--metrics', type=str, default=None,
+                            help='Append per-file, per-stage metrics to this JSON-lines file')
+        parser.add_argument('--profile', choices=STAGES, default=None,
+                            help='Run this stage under cProfile, writing <file>.<stage>.prof')
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help='Drop secondary and full-text indexes during the load and build them '
+                                 'once at the end; much faster for large loads')
+
     def handle(self, *args, **options):
         logger.debug(options)
         force = options['force']
+        workers = options['workers']
+        batch_size = options['batch_size']
+        profile = options['profile']
+        self.metrics_file = options['metrics']
+        parsers = {}
+        related = Related()
         for file in options['file']:
-            logger.info(f'Parse file {file}')
-            p = Parser(file, force=force)
+            logger.info(f'Resolve file {file}')
+            try:
+                p = Parser(file, force=force, batch_size=batch_size, profile=profile, related=related)
+            except ValueError as e:
+                logger.info(f'Skip {file}: {e}')
+                continue
+            parsers[p.path] = p
+
+        self.total = 0
+        ts = time.time()
+        defer = options['defer_indexes'] and parsers
+        if defer:
+            indexes.defer()
+        try:
+            self.load_all(parsers, workers, profile)
+        finally:
+            if defer:
+                its = time.time()
+                indexes.restore()
+                logger.info(f'Indexes rebuilt in {round(time.time() - its, 2)}s')
+        elapsed = time.time() - ts
+        logger.info(f'Total {self.total} articles from {len(parsers)} files in {round(elapsed, 2)}s, '
+                    f'{round(self.total / elapsed if elapsed else 0, 1)} articles/s')
+
+    def load_all(self, parsers, workers, profile):
+        if workers > 1 and len(parsers) > 1:
+            # Forked workers must not inherit the writer's SQLite connection
+            connections.close_all()
+            workers = min(workers, len(parsers))
+            with Pool(workers) as pool:
+                worker = partial(extract_file, profile=profile)
+                # Files load in command line order so later versions win. Each
+                # result holds a whole file's records, so only workers + 1 files
+                # are in flight: a slow writer holds back extraction instead of
+                # letting finished files pile up in memory
+                in_flight = deque()
+                for path, p in parsers.items():
+                    in_flight.append((p, pool.apply_async(worker, (path,))))
+                    if len(in_flight) > workers:
+                        self.load_result(*in_flight.popleft())
+                while in_flight:
+                    self.load_result(*in_flight.popleft())
+        else:
+            for p in parsers.values():
+                logger.info(f'Parse file {p.path}')
+                self.load(p)
+
+    def load_result(self, p, result):
+        try:
+            path, results, deleted, metrics, extract_time = result.get()
+        except Exception as e:
+            # An extraction error is re-raised here, in the writer; name the file as load() does
+            raise CommandError(f'{p.filename} failed after article {p.source.checkpoint}: {e}')
+        self.load(p, results, deleted, metrics, extract_time)
 
-            
\ No newline at end of file
+    def load(self, p, results=None, deleted=None, metrics=None, extract_time=0):
+        ts = time.time()
+        try:
+            p.parse(results, deleted, metrics)
+        except Exception as e:
+            # Stop here rather than load later files over a partial one; rerun to resume
+            raise CommandError(f'{p.filename} failed after article {p.source.checkpoint}: {e}')
+        elapsed = time.time() - ts + extract_time
+        count = p.count
+        self.total += count
+        logger.info(f'{p.filename}: {count} articles in {round(elapsed, 2)}s, '
+                    f'{round(count / elapsed if elapsed else 0, 1)} articles/s')
+        if self.metrics_file:
+            p.metrics.write(self.metrics_file, articles=count, rows=p.saved, bytes_read=p.filesize,
+                            articles_per_sec=round(count / elapsed if elapsed else 0, 1))
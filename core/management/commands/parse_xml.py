@@ -1,15 +1,20 @@
-import xmltodict
-from core.models import Article, Source
+from core import bulk
+from core.models import Article, ArticleAuthor, Author, Keyword, MeshHeading, Source
+from utility.decompress import open_xml
+from utility.extract import extract_article
+from utility.metrics import FileMetrics, MeteredReader
+from utility.xmlstream import element_to_dict, iter_elements
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
 import logging
-from multiprocessing import Pool, dummy
 from django.conf import settings
 import hashlib
 import os
 from pathlib import Path
 import time
-import collections
 import datetime
-import sys
+import itertools
 
 
 logger = logging.getLogger('pubmed')
@@ -24,168 +29,432 @@ def timeit(method):
         return result
     return timed
 
-class Parser(object):
-    month_map = {
-        'Jan': '1',
-        'Feb': '2',
-        'Mar': '3',
-        'Apr': '4',
-        'May': '5',
-        'Jun': '6',
-        'Jul': '7',
-        'Aug': '8',
-        'Sep': '9',
-        'Oct': '10',
-        'Nov': '11',
-        'Dec': '12'
-    }
-    def __init__(self, file, force=False):
+STAGES = ('hash', 'decompress', 'parse', 'extract', 'dedup', 'insert', 'related', 'backfill', 'delete')
+
+# Ids per lookup query; keeps OR-ed name lookups and IN lists well below SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def owners(queryset):
+    """{source id: number of articles} of the articles in queryset."""
+    counts = queryset.order_by().values('source_file').annotate(n=Count('id'))
+    return dict(counts.values_list('source_file', 'n'))
+
+
+def uncount(counts):
+    """Take articles that moved or were deleted off their sources' article_count."""
+    for source_id, n in counts.items():
+        Source.objects.filter(pk=source_id).update(article_count=F('article_count') - n)
+
+
+def delete_articles(queryset):
+    """Delete the articles in queryset, keeping article_count in step; return how many went."""
+    counts = owners(queryset)
+    # delete()[0] also counts the cascaded author, mesh and keyword links
+    deleted = queryset.delete()[1].get('core.Article', 0)
+    uncount(counts)
+    return deleted
+
+
+def content_hash(obj):
+    """md5 over every extracted value, related lists included, in key order."""
+    return hashlib.md5(repr([obj[x] for x in sorted(obj)]).encode()).hexdigest()
+
+
+def extract_file(path, profile=None):
+    """Pool worker: decompress, parse and extract one file without touching the DB."""
+    ts = time.time()
+    extractor = Extractor(path, profile=profile)
+    extractor.pic_info()
+    extractor.dump_profile()
+    return path, extractor.results, extractor.deleted, extractor.metrics, time.time() - ts
+
+
+class Extractor(object):
+    def __init__(self, file, profile=None):
         self.file = Path(file).resolve()
-        self.force = force
         self.path = str(self.file)
         self.filename = self.file.name
-        self.calc_md5()
-        self.filesize = self.file.stat().st_size
+        self.deleted = []
+        self.metrics = FileMetrics(self.filename, profile=profile)
+
+    def dump_profile(self):
+        """Write the cProfile stats of the profiled stage, if it ran in this process."""
+        if self.metrics.profile in self.metrics.stages:
+            self.metrics.dump_profile(f'{self.filename}.{self.metrics.profile}.prof')
+
+    def open_file(self):
+        return open_xml(self.path)
+
+    def iter_articles(self):
+        """Stream PubmedArticle records one at a time.
+
+        Every record is converted to the same dict layout the whole-file
+        xmltodict parse produced and then dropped from the element tree,
+        so memory stays flat regardless of the file size. PMIDs listed in
+        DeleteCitation elements of update files are collected in self.deleted.
+        """
+        self.deleted = []
+        with self.open_file() as f:
+            for elem in iter_elements(MeteredReader(f, self.metrics)):
+                if elem.tag == 'PubmedArticle':
+                    yield element_to_dict(elem)
+                elif elem.tag == 'DeleteCitation':
+                    self.deleted.extend(int(x.text) for x in elem.iter('PMID'))
+
+    def iter_records(self):
+        count = 0
+        for x in self.metrics.iter('parse', self.iter_articles()):
+            with self.metrics.stage('extract'):
+                obj = self.select_info_to_obj(x)
+            count += 1
+            yield obj
+        self.metrics.add('extract', items=count)
+
+    @timeit
+    def pic_info(self):
+        self.results = list(self.iter_records())
+        logger.info(f'Raw results {len(self.results)}')
+
+    def select_info_to_obj(self, pubarticle):
+        obj = extract_article(pubarticle.get('MedlineCitation'))
+        pubyear = obj.pop('pubyear') or 1000
+        pubmonth = obj.pop('pubmonth') or 1
+        pubday = obj.pop('pubday') or 1
+        try:
+            obj['pubdate'] = datetime.date(year=int(pubyear), month=int(pubmonth), day=int(pubday))
+        except ValueError as e:
+            logger.error(f'{obj["pmid"]}: {e} ({pubyear}, {pubmonth}, {pubday})')
+            obj['pubdate'] = datetime.date(year=1000, month=1, day=1)
+        obj['content_hash'] = content_hash(obj)
+        return obj
+
+
+class Interner(object):
+    """Name -> id cache for one lookup table, kept for the whole run.
+
+    resolve() inserts the values not seen yet in bulk, leaving rows that
+    already exist alone, and reads their ids back. The first `unique`
+    fields identify a row; values are cut to the column lengths first.
+    """
+    def __init__(self, model, fields, unique=None):
+        self.model = model
+        self.fields = fields
+        self.unique = unique or len(fields)
+        self.lengths = [model._meta.get_field(x).max_length for x in fields]
+        self.ids = {}
+
+    def clean(self, values):
+        return tuple(x[:n] for x, n in zip(values, self.lengths))
+
+    def resolve(self, values):
+        missing = {}
+        for x in values:
+            key = x[:self.unique]
+            if key not in self.ids:
+                missing.setdefault(key, x)
+        if not missing:
+            return
+        self.model.objects.bulk_create([self.model(**dict(zip(self.fields, x))) for x in missing.values()],
+                                       ignore_conflicts=True)
+        names = self.fields[:self.unique]
+        for keys in chunks(list(missing), LOOKUP_CHUNK):
+            if len(names) == 1:
+                query = Q(**{f'{names[0]}__in': [x[0] for x in keys]})
+            else:
+                query = Q()
+                for x in keys:
+                    query |= Q(**dict(zip(names, x)))
+            for row in self.model.objects.filter(query).values_list('id', *names):
+                self.ids[row[1:]] = row[0]
+
+    def get(self, values):
+        return self.ids[values[:self.unique]]
+
+
+class Related(object):
+    """Authors, MeSH headings and keywords of article batches, interned per run."""
+    def __init__(self):
+        self.authors = Interner(Author, ('last_name', 'fore_name', 'initials'))
+        self.mesh = Interner(MeshHeading, ('ui', 'name'), unique=1)
+        self.keywords = Interner(Keyword, ('name',))
+
+    def save(self, article_ids, related):
+        """Replace the related rows of the given articles; related holds (authors, mesh, keywords) per article."""
+        authors, mesh, keywords = [], [], []
+        for article_id, (a, m, k) in zip(article_ids, related):
+            authors.extend((article_id, position, self.authors.clean(x[:3]), x[3])
+                           for position, x in enumerate(a, 1))
+            mesh.extend((article_id, self.mesh.clean(x)) for x in m)
+            keywords.extend((article_id, self.keywords.clean((x,))) for x in k)
+        self.authors.resolve(x[2] for x in authors)
+        self.mesh.resolve(x[1] for x in mesh)
+        self.keywords.resolve(x[1] for x in keywords)
+
+        mesh_through = Article.mesh_headings.through
+        keyword_through = Article.keywords.through
+        for ids in chunks(article_ids, LOOKUP_CHUNK):
+            # Articles upserted over an older version drop its related rows first
+            ArticleAuthor.objects.filter(article_id__in=ids).delete()
+            mesh_through.objects.filter(article_id__in=ids).delete()
+            keyword_through.objects.filter(article_id__in=ids).delete()
+        bulk.insert_rows(ArticleAuthor, ('article', 'author', 'position', 'affiliation'),
+                         [(article_id, self.authors.get(name), position, affiliation)
+                          for article_id, position, name, affiliation in authors])
+        # Sets: cut names can collide, and each pair may appear only once
+        bulk.insert_rows(mesh_through, ('article', 'meshheading'),
+                         list({(article_id, self.mesh.get(x)) for article_id, x in mesh}))
+        bulk.insert_rows(keyword_through, ('article', 'keyword'),
+                         list({(article_id, self.keywords.get(x)) for article_id, x in keywords}))
+        return len(authors) + len(mesh) + len(keywords)
+
+
+class Parser(Extractor):
+    def __init__(self, file, force=False, batch_size=10000, profile=None, related=None):
+        super().__init__(file, profile=profile)
+        self.force = force
+        self.batch_size = batch_size
+        self.related = related or Related()
+        stat = self.file.stat()
+        self.filesize = stat.st_size
+        self.mtime = stat.st_mtime
+        self.md5 = None
         self.resolve_source()
-        self.parse()
     
     def resolve_source(self):
+        self.checkpoint = 0
         try:
             self.source = Source.objects.get(name=self.filename)
-            if self.source.md5 != self.md5 or self.source.size < self.filesize or Article.objects.filter(source_file=self.source).count() == 0 or self.force == True:
-                self.source.delete()
-                raise Source.DoesNotExist
-            else:
-                raise ValueError('File already parsed!')
         except Source.DoesNotExist:
-            self.source = Source(name=self.filename, md5=self.md5, 
-                                 size=self.filesize, path=self.path)
-            self.source.save()
-
-    def calc_md5(self):
-        with open(self.path, 'rb') as f:
-            hashobj = hashlib.md5(f.read())
-            self.md5 = hashobj.hexdigest()
-            logger.info(self.md5)
+            self.source = None
+        # Articles of an existing source are kept and compared by content hash
+        self.revising = self.source is not None and not self.force
+        if self.source is not None:
+            if not self.force and self.is_unchanged():
+                if self.source.status == Source.DONE:
+                    raise ValueError('File already parsed!')
+                if self.source.status == Source.PARTIAL:
+                    self.checkpoint = self.source.checkpoint
+                    logger.info(f'Resume {self.filename} after article {self.checkpoint}')
+                    return
+            if self.revising:
+                self.revise_source()
+                return
+            self.source.delete()
+        if self.md5 is None:
+            self.calc_md5()
+        self.source = Source(name=self.filename, md5=self.md5, size=self.filesize,
+                             mtime=self.mtime, path=self.path)
+        self.source.save()
+
+    def revise_source(self):
+        """Point the source at the new file version, leaving its articles in place."""
+        if self.md5 is None:
+            self.calc_md5()
+        logger.info(f'{self.filename} changed, updating its articles in place')
+        self.source.md5 = self.md5
+        self.source.size = self.filesize
+        self.source.mtime = self.mtime
+        self.source.path = self.path
+        self.source.status = Source.PENDING
+        self.source.checkpoint = 0
+        self.source.completed_at = None
+        self.source.save()
+
+    def is_unchanged(self):
+        """Compare with the existing source, hashing the file only if its (size, mtime) changed."""
+        if self.source.size == self.filesize and self.source.mtime == self.mtime:
+            return True
+        self.calc_md5()
+        if self.source.md5 == self.md5 and self.source.size >= self.filesize:
+            self.source.mtime = self.mtime
+            self.source.save(update_fields=['mtime'])
+            return True
+        return False
+
+    def calc_md5(self, chunk_size=1 << 20):
+        hashobj = hashlib.md5()
+        with self.metrics.stage('hash'), open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hashobj.update(chunk)
+        self.metrics.add('hash', bytes=self.filesize)
+        self.md5 = hashobj.hexdigest()
+        logger.info(self.md5)
     
-    def parse(self):
+    def parse(self, results=None, deleted=None, metrics=None):
+        """Load the file into the DB, extracting it here unless a worker already did.
+
+        Records flow through dedup and insert as a generator, so only one
+        batch of model instances is alive at a time. On failure the source
+        stays partial with its checkpoint, and the next run resumes there.
+        """
         try:
-            self.read_file()
-            self.parse_to_dict()
-            self.pic_info()
-            self.filt_dup()
-            self.save_todb()
+            if results is None:
+                records = self.iter_records()
+            else:
+                records = iter(results)
+                self.deleted = deleted or []
+            self.save_todb(self.metrics.iter('dedup', self.filt_dup(records)))
+            if self.revising:
+                self.delete_missing()
             self.update_none_field()
+            self.delete_citations()
+            self.mark_done()
         except Exception as e:
-            sys.exit(e)
-    
-    @timeit
-    def read_file(self):
-        if self.path.endswith('gz'):
-            with gzip.open(self.path, 'rt') as f:
-                self.xml_text = f.read()
-        else:
-            with open(self.path) as f:
-                self.xml_text = f.read()
-        logger.info('Read file done!')
+            logger.error(f'{self.filename} failed after article {self.source.checkpoint}: {e}')
+            raise
+        finally:
+            self.dump_profile()
+            if metrics is not None:
+                self.metrics.merge(metrics)
 
-    @timeit
-    def parse_to_dict(self):
-        self.xml_dict = xmltodict.parse(self.xml_text)
-        logger.info('Parse to dict done!')
-    
-    @timeit
-    def pic_info(self):
-        pubarticles = self.xml_dict.get('PubmedArticleSet', {}).get('PubmedArticle', [])
-        logger.info(len(pubarticles))
-        # self.results = multiprocessing.Manager().list()
-        self.results = []
-        # pool = dummy.Pool(settings.PARSE_PROCESS)
-        # pool.map_async(self.select_info_to_obj, pubarticles, error_callback=logger.info)
-        # pool.close()
-        # pool.join()
-        for x in pubarticles:
-            self.select_info_to_obj(x)
-        logger.info(f'Raw results {len(self.results)}')
-    
-    @timeit
-    def filt_dup(self):
+    def filt_dup(self, records):
+        """Yield the first record of every pmid, keeping later ones in self.dup.
+
+        self.count is the stream position of the last record handed out;
+        records at or before the resume checkpoint are only deduplicated.
+        """
+        self.count = 0
         self.uniq_pmid = set()
-        self.new_result = []
         self.dup = []
-        for x in self.results:
+        for x in records:
+            self.count += 1
             if x['pmid'] not in self.uniq_pmid:
                 self.uniq_pmid.add(x['pmid'])
-                self.new_result.append(x)
+                if self.count > self.checkpoint:
+                    yield x
             else:
                 self.dup.append(x)
-        self.results = self.new_result
-        logger.info(f'Uniq Results {len(self.results)}')
-    
+
     @timeit
-    def save_todb(self):
-        db_objs = []
-        for x in self.results:
-            obj = Article(source_file = self.source, **x)            
-            db_objs.append(obj)
-        Article.objects.bulk_create(db_objs)        
+    def save_todb(self, records):
+        """Upsert records in batches.
+
+        A pmid an earlier file already loaded is replaced by the version in
+        this file, so update files can be applied on top of the baseline.
+        """
+        self.saved = 0
+        unchanged = 0
+        while True:
+            with self.metrics.stage('insert'):
+                batch = list(itertools.islice(records, self.batch_size))
+                if not batch:
+                    break
+                # pmid -> content hash of the rows this source already holds
+                stored = self.stored_hashes(batch) if self.revising else {}
+                changed = [x for x in batch if stored.get(x['pmid']) != x['content_hash']]
+                related = [(x.pop('authors'), x.pop('mesh'), x.pop('keywords')) for x in changed]
+                related_rows = 0
+                with transaction.atomic():
+                    if changed:
+                        self.take_over(changed)
+                        article_ids = self.upsert(changed)
+                        with self.metrics.stage('related'):
+                            related_rows = self.related.save(article_ids, related)
+                    Source.objects.filter(pk=self.source.pk).update(
+                        status=Source.PARTIAL, checkpoint=self.count,
+                        article_count=F('article_count') + len(batch) - len(stored))
+            self.metrics.add('insert', rows=len(changed))
+            self.metrics.add('related', rows=related_rows)
+            self.source.checkpoint = self.count
+            self.saved += len(changed)
+            unchanged += len(batch) - len(changed)
+        logger.info(f'Raw results {self.count}, uniq results {len(self.uniq_pmid)}, '
+                    f'written {self.saved}, unchanged {unchanged}')
+
+    def take_over(self, batch):
+        """Uncount pmids other sources hold from those sources; the upsert moves them here."""
+        counts = {}
+        for pmids in chunks([x['pmid'] for x in batch], LOOKUP_CHUNK):
+            moved = owners(Article.objects.filter(pmid__in=pmids).exclude(source_file=self.source))
+            for source_id, n in moved.items():
+                counts[source_id] = counts.get(source_id, 0) + n
+        uncount(counts)
+
+    def stored_hashes(self, batch):
+        stored = {}
+        for pmids in chunks([x['pmid'] for x in batch], LOOKUP_CHUNK):
+            stored.update(Article.objects.filter(pmid__in=pmids, source_file=self.source)
+                          .values_list('pmid', 'content_hash'))
+        return stored
 
     @timeit
-    def update_none_field(self):
+    def delete_missing(self):
+        """Remove articles of this source that its revised file no longer contains."""
+        stored = Article.objects.filter(source_file=self.source).values_list('pmid', flat=True)
+        missing = [x for x in stored.iterator() if x not in self.uniq_pmid]
         count = 0
+        for batch in chunks(missing, self.batch_size):
+            with self.metrics.stage('delete'), transaction.atomic():
+                for pmids in chunks(batch, LOOKUP_CHUNK):
+                    count += delete_articles(Article.objects.filter(pmid__in=pmids, source_file=self.source))
+        self.metrics.add('delete', rows=count)
+        logger.info(f'Deleted {count} record no longer in {self.filename}')
+
+    def upsert(self, batch):
+        """Insert or replace a batch of article dicts, returning their ids in order."""
+        fields = [f.name for f in Article._meta.concrete_fields if not f.primary_key]
+        if bulk.is_postgresql():
+            rows = [tuple(self.source.pk if name == 'source_file' else x[name] for name in fields)
+                    for x in batch]
+            ids = bulk.copy_upsert(Article, fields, rows, unique='pmid')
+            return [ids[x['pmid']] for x in batch]
+        db_objs = [Article(source_file=self.source, **x) for x in batch]
+        Article.objects.bulk_create(db_objs, update_conflicts=True, unique_fields=['pmid'],
+                                    update_fields=[x for x in fields if x != 'pmid'])
+        return self.article_ids(db_objs)
+
+    def article_ids(self, db_objs):
+        """Primary keys of upserted articles; read back where the backend didn't return them."""
+        if all(x.pk is not None for x in db_objs):
+            return [x.pk for x in db_objs]
+        ids = {}
+        for pmids in chunks([x.pmid for x in db_objs], LOOKUP_CHUNK):
+            ids.update(Article.objects.filter(pmid__in=pmids).values_list('pmid', 'id'))
+        return [ids[x.pmid] for x in db_objs]
+
+    @timeit
+    def update_none_field(self):
+        """Fill missing abstracts from duplicate records, one query per chunk of pmids."""
+        with self.metrics.stage('backfill'):
+            count = self.backfill_abstracts()
+        self.metrics.add('backfill', rows=count)
+        logger.info(f'Updated {count} record using dup info')
+
+    def backfill_abstracts(self):
+        abstracts = {}
         for x in self.dup:
             if x['abstract']:
-                try:
-                    obj = Article.objects.get(pmid=x['pmid'], abstract__isnull=True)    
-                    obj.abstract = x['abstract']
-                    obj.save()
-                    count += 1
-                except Article.DoesNotExist:
-                    pass
-        logger.info(f'Updated {count} record using dup info')
+                abstracts.setdefault(x['pmid'], x['abstract'])
+        pmids = list(abstracts)
+        count = 0
+        for batch in chunks(pmids, self.batch_size):
+            objs = []
+            for ids in chunks(batch, LOOKUP_CHUNK):
+                objs.extend(Article.objects.filter(pmid__in=ids, abstract__isnull=True).only('id', 'pmid'))
+            for obj in objs:
+                obj.abstract = abstracts[obj.pmid]
+            with transaction.atomic():
+                Article.objects.bulk_update(objs, ['abstract'])
+            count += len(objs)
+        return count
 
-    def select_info_to_obj(self, pubarticle):
-        info = pubarticle.get('MedlineCitation', {})
-        pmid = info.get('PMID', {}).get('#text')
-        if pmid:
-            pmid = int(pmid)
-        else:
-            pmid = 0
-        journal = info.get('Article', {}).get('Journal', {}).get( 'Title')
-        issue = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Issue')
-        volume = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Volume')
-        pubyear = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Year', 1000)
-        month = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Month', 1)
-        pubday = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Day', 1)
-    
-        pubmonth = self.month_map.get(month, 1)
-        title = info.get('Article', {}).get('ArticleTitle')
-        if type(title) == collections.OrderedDict:
-            title = title.get('#text')
-        page = info.get('Article', {}).get('Pagination', {}).get('MedlinePgn')
-        abstract = info.get('Article', {}).get('Abstract', {}).get('AbstractText')
-        if type(abstract) == list:
-            temp_list = [x.get('#text', str(x)) for x in abstract if type(x) == collections.OrderedDict]
-            abstract = ' '.join(temp_list)
-        elif type(abstract) == collections.OrderedDict:
-            abstract = abstract.get('#text')
-
-        author = info.get('Article', {}).get('AuthorList', {}).get('Author', [{}])
-        if type(author) == list:
-            if len(author) > 0:
-                author = author[0].get('Initials')
-        elif type(author) == dict or type(author) == collections.OrderedDict:
-            # logger.info(author)
-            author = author.get('Initials')
-
-        language = info.get('Article', {}).get('Language', '')
-        if type(language) == list:
-            language = ','.join(language)
-        try:
-            pubdate = datetime.date(year=int(pubyear), month=int(pubmonth), day=int(pubday))
-        except Exception as e:
-            logger.error(e)
-            logger.info(pubyear, pubmonth, pubday)
-            
-        obj = dict(pmid=pmid,journal=journal,issue=issue, volume=volume, pubdate=pubdate, title=title, page=page, abstract=abstract, author=author, language=language)
-        self.results.append(obj)
+    @timeit
+    def delete_citations(self):
+        """Remove the articles listed in the file's DeleteCitation elements."""
+        count = 0
+        for batch in chunks(self.deleted, self.batch_size):
+            with self.metrics.stage('delete'), transaction.atomic():
+                for pmids in chunks(batch, LOOKUP_CHUNK):
+                    count += delete_articles(Article.objects.filter(pmid__in=pmids))
+        self.metrics.add('delete', rows=count)
+        logger.info(f'Deleted {count} record of {len(self.deleted)} DeleteCitation pmid')
+
+    def mark_done(self):
+        Source.objects.filter(pk=self.source.pk).update(status=Source.DONE, completed_at=timezone.now())
+        self.source.refresh_from_db()
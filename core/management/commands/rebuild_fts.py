@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import search
+import logging
+
+logger = logging.getLogger('pubmed')
+
+
+class Command(BaseCommand):
+    help = "Rebuild the title/abstract full-text index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop-triggers', action='store_true',
+                            help='Stop maintaining the index on every write, e.g. before a bulk load')
+        parser.add_argument('--no-optimize', action='store_true', help='Skip merging the index b-trees')
+
+    def handle(self, *args, **options):
+        try:
+            if options['drop_triggers']:
+                search.drop_triggers()
+                logger.info('Full-text triggers dropped, run rebuild_fts after loading')
+                return
+            search.rebuild(optimize=not options['no_optimize'])
+            search.create_triggers()
+        except search.SearchUnavailable as e:
+            raise CommandError(e)
+        logger.info('Full-text index rebuilt')
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Source
+import fcntl
+import glob
+import logging
+import os
+
+logger = logging.getLogger('pubmed')
+
+
+class Command(BaseCommand):
+    help = "Load the new or changed files of a local PubMed mirror, in filename order"
+
+    def add_arguments(self, parser):
+        parser.add_argument('mirror', type=str, help='Directory holding the baseline and updatefiles .xml.gz')
+        parser.add_argument('--pattern', default='*.xml.gz')
+        parser.add_argument('--lock-file', default=os.path.join(settings.BASE_DIR, 'sync_pubmed.lock'),
+                            help='Held while syncing; a second run finding it locked exits at once')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the files that would be loaded')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--defer-indexes', action='store_true')
+
+    def handle(self, *args, **options):
+        mirror = options['mirror']
+        if not os.path.isdir(mirror):
+            raise CommandError(f'{mirror} is not a directory')
+        with open(options['lock_file'], 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.warning(f'Another sync holds {options["lock_file"]}, exiting')
+                return
+            # flock goes away with the process, so a crashed run never leaves a stale lock
+            lock.truncate(0)
+            lock.write(f'{os.getpid()}\n')
+            lock.flush()
+            self.sync(mirror, options)
+
+    def pending(self, files):
+        """Files without a done Source of the same size and mtime; the rest is never opened."""
+        done = {name: (size, mtime) for name, size, mtime in
+                Source.objects.filter(status=Source.DONE).values_list('name', 'size', 'mtime')}
+        todo = []
+        for path in files:
+            stat = os.stat(path)
+            if done.get(os.path.basename(path)) != (stat.st_size, stat.st_mtime):
+                todo.append(path)
+        return todo
+
+    def sync(self, mirror, options):
+        files = sorted(glob.glob(os.path.join(mirror, options['pattern'])), key=os.path.basename)
+        todo = self.pending(files)
+        logger.info(f'{len(files)} files in {mirror}, {len(todo)} to load')
+        if options['dry_run']:
+            for path in todo:
+                self.stdout.write(path)
+            return
+        if todo:
+            # parse_pubmed re-checks each file against its Source (md5 for touched files,
+            # checkpoint for partial ones) and loads them in this order
+            call_command('parse_pubmed', *todo, workers=options['workers'], batch_size=options['batch_size'],
+                         defer_indexes=options['defer_indexes'])
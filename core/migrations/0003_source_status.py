@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing(apps, schema_editor):
+    # Sources loaded before status tracking are done if they have any articles
+    Source = apps.get_model('core', 'Source')
+    for source in Source.objects.annotate(n=Count('article')).filter(n__gt=0):
+        source.article_count = source.n
+        source.status = 'done'
+        source.save(update_fields=['article_count', 'status'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_source_mtime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='article_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='source',
+            name='completed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='source',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('partial', 'Partial'), ('done', 'Done')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
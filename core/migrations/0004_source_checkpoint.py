@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_source_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='checkpoint',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    '''CREATE VIRTUAL TABLE core_article_fts USING fts5(
+        title, abstract, content='core_article', content_rowid='id')''',
+    '''CREATE TRIGGER core_article_fts_ai AFTER INSERT ON core_article BEGIN
+        INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+    END''',
+    '''CREATE TRIGGER core_article_fts_ad AFTER DELETE ON core_article BEGIN
+        INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+        VALUES ('delete', old.id, old.title, old.abstract);
+    END''',
+    '''CREATE TRIGGER core_article_fts_au AFTER UPDATE OF title, abstract ON core_article BEGIN
+        INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+        VALUES ('delete', old.id, old.title, old.abstract);
+        INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+    END''',
+    "INSERT INTO core_article_fts (core_article_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS core_article_fts_ai',
+    'DROP TRIGGER IF EXISTS core_article_fts_ad',
+    'DROP TRIGGER IF EXISTS core_article_fts_au',
+    'DROP TABLE IF EXISTS core_article_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # FTS5 is SQLite only; other backends simply have no search index
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_source_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
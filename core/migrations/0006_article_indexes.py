@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_article_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['journal', 'pubdate'], name='core_article_journal_date'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['pubdate'], name='core_article_pubdate'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['language'], name='core_article_language'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('abstract__isnull', True)), fields=['pmid'], name='core_article_no_abstract'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_article_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Keyword',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MeshHeading',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ui', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_name', models.CharField(max_length=200)),
+                ('fore_name', models.CharField(default='', max_length=100)),
+                ('initials', models.CharField(default='', max_length=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('last_name', 'fore_name', 'initials'), name='core_author_name')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('affiliation', models.TextField(null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.article')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.author')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='authors',
+            field=models.ManyToManyField(related_name='articles', through='core.ArticleAuthor', to='core.author'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='keywords',
+            field=models.ManyToManyField(related_name='articles', to='core.keyword'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='mesh_headings',
+            field=models.ManyToManyField(related_name='articles', to='core.meshheading'),
+        ),
+        migrations.AddConstraint(
+            model_name='articleauthor',
+            constraint=models.UniqueConstraint(fields=('article', 'position'), name='core_articleauthor_position'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Adding the m2m fields in 0007 makes SQLite rebuild core_article, which
+# drops the full-text triggers of 0005 along with the old table
+CREATE_SQL = [
+    '''CREATE TRIGGER IF NOT EXISTS core_article_fts_ai AFTER INSERT ON core_article BEGIN
+        INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS core_article_fts_ad AFTER DELETE ON core_article BEGIN
+        INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+        VALUES ('delete', old.id, old.title, old.abstract);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS core_article_fts_au AFTER UPDATE OF title, abstract ON core_article BEGIN
+        INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+        VALUES ('delete', old.id, old.title, old.abstract);
+        INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+    END''',
+    "INSERT INTO core_article_fts (core_article_fts) VALUES ('rebuild')",
+]
+
+
+def restore(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_article_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore, migrations.RunPython.noop),
+    ]
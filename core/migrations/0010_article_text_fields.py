@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+# Real records overflow the old lengths: conference journal titles run past
+# 150 characters, and a record in five languages is more than 15
+FIELDS = ('journal', 'volume', 'issue', 'page', 'author', 'language')
+
+
+def widen(apps, schema_editor):
+    # SQLite never enforced the lengths, and altering a column there rebuilds
+    # core_article, dropping its full-text triggers (see 0009)
+    if schema_editor.connection.vendor == 'sqlite':
+        return
+    Article = apps.get_model('core', 'Article')
+    for name in FIELDS:
+        old = Article._meta.get_field(name)
+        new = models.TextField(null=old.null)
+        new.set_attributes_from_name(name)
+        new.model = Article
+        schema_editor.alter_field(Article, old, new)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_restore_article_fts_triggers'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(widen, migrations.RunPython.noop)],
+            state_operations=[
+                migrations.AlterField(model_name='article', name=name,
+                                      field=models.TextField() if name == 'journal' else models.TextField(null=True))
+                for name in FIELDS
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_article_text_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='source',
+            name='path',
+            field=models.TextField(),
+        ),
+    ]
@@ -3,26 +3,99 @@ from django.db import models
 # Create your models here.
 class Article(models.Model):
     pmid = models.IntegerField(unique=True)
-    journal = models.CharField(max_length=100)
+    journal = models.TextField()
     pubdate = models.DateField()
-    volume = models.CharField(max_length=20, null=True)
-    issue = models.CharField(max_length=20, null=True)
+    volume = models.TextField(null=True)
+    issue = models.TextField(null=True)
     title = models.TextField()
     abstract = models.TextField(null=True)
-    page = models.CharField(max_length=20, null=True)
-    author = models.CharField(max_length=10, null=True)
-    language = models.CharField(max_length=15, null=True)
+    page = models.TextField(null=True)
+    author = models.TextField(null=True)
+    language = models.TextField(null=True)
     source_file = models.ForeignKey('Source', on_delete=models.CASCADE)
+    # md5 of the extracted record; a revised source file only rewrites rows where it differs
+    content_hash = models.CharField(max_length=32, null=True)
+    authors = models.ManyToManyField('Author', through='ArticleAuthor', related_name='articles')
+    mesh_headings = models.ManyToManyField('MeshHeading', related_name='articles')
+    keywords = models.ManyToManyField('Keyword', related_name='articles')
+
+    class Meta:
+        # Index names are fixed so core.indexes can drop and rebuild them around a bulk load
+        indexes = [
+            models.Index(fields=['journal', 'pubdate'], name='core_article_journal_date'),
+            models.Index(fields=['pubdate'], name='core_article_pubdate'),
+            models.Index(fields=['language'], name='core_article_language'),
+            # Only the rows update_none_field can fill, so the index stays small
+            models.Index(fields=['pmid'], condition=models.Q(abstract__isnull=True),
+                         name='core_article_no_abstract'),
+        ]
 
     def __str__(self):
         return str(self.pmid)
 
 
+class Author(models.Model):
+    # One row per distinct name; a collective (group) author is stored in last_name
+    last_name = models.CharField(max_length=200)
+    fore_name = models.CharField(max_length=100, default='')
+    initials = models.CharField(max_length=20, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['last_name', 'fore_name', 'initials'], name='core_author_name'),
+        ]
+
+    def __str__(self):
+        return f'{self.last_name} {self.initials}'.strip()
+
+
+class ArticleAuthor(models.Model):
+    article = models.ForeignKey('Article', on_delete=models.CASCADE)
+    author = models.ForeignKey('Author', on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField()
+    affiliation = models.TextField(null=True)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'position'], name='core_articleauthor_position'),
+        ]
+
+
+class MeshHeading(models.Model):
+    ui = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=200)
+
+    def __str__(self):
+        return self.name
+
+
+class Keyword(models.Model):
+    name = models.CharField(max_length=200, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Source(models.Model):
+    PENDING = 'pending'
+    PARTIAL = 'partial'
+    DONE = 'done'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PARTIAL, 'Partial'),
+        (DONE, 'Done'),
+    )
+
     name = models.CharField(max_length=50, unique=True)
     md5 = models.CharField(max_length=32, unique=True)
     size = models.BigIntegerField()
-    path = models.CharField(max_length=100)
+    mtime = models.FloatField(null=True)
+    path = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    article_count = models.IntegerField(default=0)
+    checkpoint = models.IntegerField(default=0)
+    completed_at = models.DateTimeField(null=True)
 
     def __str__(self):
-        return str(self.name) + '_' + str(self.article_set.count())
+        return str(self.name) + '_' + str(self.article_count)
@@ -0,0 +1,93 @@
+"""Full-text search over Article title and abstract (SQLite FTS5).
+
+core_article_fts is an external-content FTS5 table over core_article: it
+stores only the index, keyed by the article id. Triggers created by
+migration 0005 (again by 0009, as 0007 rebuilds the table on SQLite) keep
+it in step with every insert, upsert and delete, so Parser.save_todb
+fills it inside the same transaction as each batch. For
+a bulk load, drop_triggers() first and rebuild() afterwards
+(`manage.py rebuild_fts`); re-indexing once is much faster than updating
+the index row by row.
+"""
+from django.db import connection
+
+FTS_TABLE = 'core_article_fts'
+
+TRIGGERS = {
+    'core_article_fts_ai': '''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_ai AFTER INSERT ON core_article BEGIN
+            INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+        END''',
+    'core_article_fts_ad': '''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_ad AFTER DELETE ON core_article BEGIN
+            INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+            VALUES ('delete', old.id, old.title, old.abstract);
+        END''',
+    'core_article_fts_au': '''
+        CREATE TRIGGER IF NOT EXISTS core_article_fts_au AFTER UPDATE OF title, abstract ON core_article BEGIN
+            INSERT INTO core_article_fts (core_article_fts, rowid, title, abstract)
+            VALUES ('delete', old.id, old.title, old.abstract);
+            INSERT INTO core_article_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+        END''',
+}
+
+# bm25 column weights: a hit in the title counts ten times one in the abstract
+TITLE_WEIGHT = 10.0
+ABSTRACT_WEIGHT = 1.0
+
+
+class SearchUnavailable(Exception):
+    """The database has no full-text index: FTS5 is SQLite only."""
+
+
+def check_backend():
+    if connection.vendor != 'sqlite':
+        raise SearchUnavailable(f'Full-text search needs SQLite FTS5, not {connection.vendor}')
+
+
+def create_triggers():
+    check_backend()
+    with connection.cursor() as cursor:
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+
+
+def drop_triggers():
+    check_backend()
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild(optimize=True):
+    """Re-index every article from core_article."""
+    check_backend()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        if optimize:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def quote(query):
+    """Turn free text into an FTS5 query matching all of its words."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search(query, limit=20, offset=0, raw=False):
+    """Return pmids matching query, best match first.
+
+    Unless raw is set, query is treated as plain words that must all
+    appear; raw passes it through as FTS5 syntax (phrases, OR, NEAR, prefix*).
+    """
+    check_backend()
+    if not raw:
+        query = quote(query)
+    if not query:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT a.pmid FROM {FTS_TABLE} JOIN core_article a ON a.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY bm25({FTS_TABLE}, %s, %s)
+            LIMIT %s OFFSET %s''', [query, TITLE_WEIGHT, ABSTRACT_WEIGHT, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
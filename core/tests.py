@@ -1,3 +1,308 @@
-from django.test import TestCase
+import datetime
+import fcntl
+import gzip
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from benchmarks.synth import generate
+from core import bulk, search
+from core.management.commands.parse_xml import Extractor, Parser, Related
+from core.management.commands.sync_pubmed import Command as SyncCommand
+from core.models import Article, ArticleAuthor, Keyword, Source
+from utility import pic_uniq
+
+LONG_JOURNAL = ('Conference proceedings : ... Annual International Conference of the IEEE Engineering '
+                'in Medicine and Biology Society. IEEE Engineering in Medicine and Biology Society. Annual Conference')
+LANGUAGES = ('eng', 'fre', 'ger', 'ita', 'spa')
+
+
+class FixtureMixin(object):
+    """A temp directory of synthetic PubMed files, removed after the test."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def fixture(self, name, articles=50, seed=0, start=1):
+        return generate(os.path.join(self.tmp, name), articles, seed=seed, start=start)
+
+    def edit(self, path, change):
+        """Rewrite the XML of a fixture with change(xml) -> xml."""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            xml = change(f.read())
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(xml)
+        return path
+
+    def long_fields_fixture(self, name, articles=5):
+        """A fixture whose articles overflow the original varchar lengths."""
+        def change(xml):
+            xml = re.sub(r'</JournalIssue><Title>[^<]*</Title>', f'</JournalIssue><Title>{LONG_JOURNAL}</Title>', xml)
+            xml = re.sub(r'(<Language>[^<]*</Language>)+', ''.join(f'<Language>{x}</Language>' for x in LANGUAGES),
+                         xml)
+            return re.sub(r'<MedlinePgn>[^<]*</MedlinePgn>', '<MedlinePgn>e1000123-e1000123.e1000145</MedlinePgn>',
+                          xml)
+        return self.edit(self.fixture(name, articles), change)
+
+    def update_fixture(self, name, articles, start, delete):
+        """An update file that also deletes the pmids in delete."""
+        pmids = ''.join(f'<PMID Version="1">{x}</PMID>' for x in delete)
+        return self.edit(self.fixture(name, articles, seed=1, start=start),
+                         lambda xml: xml.replace('</PubmedArticleSet>',
+                                                 f'<DeleteCitation>{pmids}</DeleteCitation></PubmedArticleSet>'))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 is SQLite only')
+class SearchTest(FixtureMixin, TestCase):
+
+    def test_triggers_survive_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            self.assertEqual({x[0] for x in cursor.fetchall()}, set(search.TRIGGERS))
+
+    def test_loaded_articles_are_searchable(self):
+        call_command('parse_pubmed', self.fixture('pubmed19n0001.xml.gz'))
+        pmids = search.search('cancer', limit=1000)
+        self.assertTrue(pmids)
+        matching = Article.objects.filter(Q(title__icontains='cancer') | Q(abstract__icontains='cancer'))
+        self.assertEqual(len(pmids), matching.count())
+
+
+@unittest.skipIf(connection.vendor == 'sqlite', 'SQLite has full-text search')
+class NoSearchTest(TestCase):
+
+    def test_search_unavailable(self):
+        with self.assertRaises(search.SearchUnavailable):
+            search.search('cancer')
+        with self.assertRaisesMessage(CommandError, 'needs SQLite FTS5'):
+            call_command('rebuild_fts')
+
+
+class IngestTest(FixtureMixin, TestCase):
+
+    def test_long_fields_are_stored_whole(self):
+        call_command('parse_pubmed', self.long_fields_fixture('pubmed19n0001.xml.gz'))
+        self.assertEqual(Article.objects.count(), 5)
+        for journal, language, page in Article.objects.values_list('journal', 'language', 'page'):
+            self.assertEqual(journal, LONG_JOURNAL)
+            self.assertEqual(language, ','.join(LANGUAGES))
+            self.assertEqual(page, 'e1000123-e1000123.e1000145')
+
+    def test_deep_source_path(self):
+        deep = os.path.join(self.tmp, *['mirror-of-ftp.ncbi.nlm.nih.gov'] * 6)
+        os.makedirs(deep)
+        call_command('parse_pubmed', generate(os.path.join(deep, 'pubmed19n0001.xml.gz'), 5))
+        self.assertEqual(Source.objects.get().path, os.path.realpath(os.path.join(deep, 'pubmed19n0001.xml.gz')))
+
+    def test_loaded_rows_match_extracted(self):
+        path = self.fixture('pubmed19n0001.xml.gz', articles=200)
+        expected = {}
+        for x in Extractor(path).iter_records():
+            expected.setdefault(x['pmid'], x)
+        call_command('parse_pubmed', path)
+        fields = [f.name for f in Article._meta.concrete_fields if f.name not in ('id', 'source_file')]
+        self.assertEqual({x[0]: x for x in Article.objects.values_list(*fields)},
+                         {pmid: tuple(x[f] for f in fields) for pmid, x in expected.items()})
+        authors = {}
+        for row in ArticleAuthor.objects.order_by('article__pmid', 'position').values_list(
+                'article__pmid', 'author__last_name', 'author__fore_name', 'author__initials', 'affiliation'):
+            authors.setdefault(row[0], []).append(row[1:])
+        self.assertEqual(authors, {pmid: x['authors'] for pmid, x in expected.items() if x['authors']})
+
+    def test_resume_after_failed_batch(self):
+        path = self.fixture('pubmed19n0001.xml.gz', articles=50)
+        save = Related.save
+        calls = []
+
+        def fail_third(related, *args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError('disk full')
+            return save(related, *args)
+
+        with mock.patch.object(Related, 'save', fail_third):
+            with self.assertRaisesMessage(CommandError, 'failed after article 20: disk full'):
+                call_command('parse_pubmed', path, batch_size=10)
+        source = Source.objects.get()
+        self.assertEqual((source.status, source.checkpoint, source.article_count), (Source.PARTIAL, 20, 20))
+        self.assertEqual(Article.objects.count(), 20)
+
+        upsert = Parser.upsert
+        written = []
+
+        def record(parser, batch):
+            written.extend(x['pmid'] for x in batch)
+            return upsert(parser, batch)
+
+        with mock.patch.object(Parser, 'upsert', record):
+            call_command('parse_pubmed', path, batch_size=10)
+        source.refresh_from_db()
+        self.assertEqual(source.status, Source.DONE)
+        self.assertEqual(sorted(written), list(range(21, 51)))
+        self.assertEqual(source.article_count, Article.objects.count())
+        self.assertEqual(Article.objects.count(), 50)
+
+    def assert_article_counts(self):
+        for source in Source.objects.all():
+            self.assertEqual(source.article_count, Article.objects.filter(source_file=source).count(), source.name)
+
+    def test_article_count_follows_moves_and_deletes(self):
+        call_command('parse_pubmed', self.fixture('pubmed19n0001.xml.gz', articles=40))
+        # pmids 31-40 move to the update file, 5 is deleted
+        update = self.update_fixture('pubmed19n0002.xml.gz', 20, start=31, delete=[5])
+        call_command('parse_pubmed', update)
+        self.assert_article_counts()
+        self.assertFalse(Article.objects.filter(pmid=5).exists())
+        # The revised update drops pmid 50 and deletes 6 as well
+        self.update_fixture('pubmed19n0002.xml.gz', 19, start=31, delete=[5, 6])
+        call_command('parse_pubmed', update)
+        self.assert_article_counts()
+        self.assertFalse(Article.objects.filter(pmid__in=[6, 50]).exists())
+        self.assertEqual(Source.objects.get(name='pubmed19n0002.xml.gz').article_count, 19)
+
+
+class ParallelLoadTest(FixtureMixin, TransactionTestCase):
+    # The pool path closes the writer's connection before forking; a TestCase transaction can't survive that
+
+    def test_failed_extraction_names_the_file(self):
+        good = self.fixture('pubmed19n0001.xml.gz')
+        bad = self.fixture('pubmed19n0002.xml.gz', start=1000)
+        with open(bad, 'r+b') as f:
+            f.truncate(os.path.getsize(bad) // 2)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                with self.assertRaisesMessage(CommandError, 'pubmed19n0002.xml.gz failed after article 0'):
+                    call_command('parse_pubmed', good, bad, workers=workers, force=True)
+                self.assertEqual(Source.objects.get(name='pubmed19n0001.xml.gz').status, Source.DONE)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'COPY is PostgreSQL only')
+class BulkTest(TestCase):
+    FIELDS = ('pmid', 'journal', 'pubdate', 'title', 'abstract', 'language', 'source_file')
+    AWKWARD = 'tab\there, new\nline, back\\slash, \\N and ünïcode'
+
+    def setUp(self):
+        self.source = Source.objects.create(name='s.xml.gz', md5='0' * 32, size=1, path='s.xml.gz')
+
+    def row(self, pmid, title, journal='Nature', abstract=None, language='eng'):
+        return (pmid, journal, datetime.date(2019, 1, pmid), title, abstract, language, self.source.pk)
+
+    def test_copy_upsert_inserts_and_replaces(self):
+        ids = bulk.copy_upsert(Article, self.FIELDS, [self.row(1, 'One'), self.row(2, 'Two', abstract=self.AWKWARD)],
+                               unique='pmid')
+        self.assertEqual(ids, dict(Article.objects.values_list('pmid', 'id')))
+        self.assertEqual(Article.objects.get(pmid=2).abstract, self.AWKWARD)
+
+        again = bulk.copy_upsert(Article, self.FIELDS, [self.row(2, 'Two, revised', journal=LONG_JOURNAL,
+                                                                 language=','.join(LANGUAGES)), self.row(3, 'Three')],
+                                 unique='pmid')
+        self.assertEqual(again[2], ids[2])
+        self.assertEqual(Article.objects.count(), 3)
+        article = Article.objects.get(pmid=2)
+        self.assertEqual((article.title, article.journal, article.abstract), ('Two, revised', LONG_JOURNAL, None))
+
+    def test_insert_rows(self):
+        names = ['plain', self.AWKWARD, 'x' * 200]
+        bulk.insert_rows(Keyword, ['name'], [(x,) for x in names])
+        self.assertEqual(sorted(Keyword.objects.values_list('name', flat=True)), sorted(names))
+
+    def test_copy_text_round_trips(self):
+        # copy_text feeds psycopg2's copy_expert; check its escaping against the server's COPY parser
+        values = [self.AWKWARD, None, '', 'a\rb\r\n']
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMP TABLE copy_text_test (id integer, value text)')
+            with cursor.cursor.copy('COPY copy_text_test (id, value) FROM STDIN') as copy:
+                copy.write(''.join(f'{i}\t{bulk.copy_text(x)}\n' for i, x in enumerate(values)))
+            cursor.execute('SELECT value FROM copy_text_test ORDER BY id')
+            self.assertEqual([x[0] for x in cursor.fetchall()], values)
+
+
+class SyncTest(FixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mirror = os.path.join(self.tmp, 'mirror')
+        os.mkdir(self.mirror)
+        self.lock_file = os.path.join(self.tmp, 'sync.lock')
+        for i in range(2):
+            self.mirror_file(i)
+
+    def mirror_file(self, i):
+        return generate(os.path.join(self.mirror, f'pubmed19n{i + 1:04d}.xml.gz'), 20, seed=i, start=1 + i * 100)
+
+    def sync(self, **options):
+        out = io.StringIO()
+        call_command('sync_pubmed', self.mirror, lock_file=self.lock_file, stdout=out, **options)
+        return out.getvalue().split()
+
+    def test_pending_skips_loaded_files(self):
+        self.sync()
+        new = self.mirror_file(2)
+        touched = os.path.join(self.mirror, 'pubmed19n0001.xml.gz')
+        os.utime(touched, (0, 0))
+        files = sorted(os.path.join(self.mirror, x) for x in os.listdir(self.mirror))
+        self.assertEqual(SyncCommand().pending(files), [touched, new])
+
+    def test_second_run_queues_nothing(self):
+        self.assertEqual(len(self.sync(dry_run=True)), 2)
+        self.sync()
+        self.assertEqual(Source.objects.filter(status=Source.DONE).count(), 2)
+        self.assertEqual(self.sync(dry_run=True), [])
+
+    def test_held_lock_exits_without_loading(self):
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.sync()
+        self.assertFalse(Source.objects.exists())
+        self.assertFalse(Article.objects.exists())
+
+
+class ApiTest(FixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.API_CACHE_ALIAS].clear()
+        call_command('parse_pubmed', self.fixture('pubmed19n0001.xml.gz', articles=30))
+
+    def test_pages_cover_every_article_once(self):
+        pmids, after = [], 0
+        while after is not None:
+            data = self.client.get(reverse('core:article_list'), {'limit': 7, 'after': after}).json()
+            pmids.extend(x['pmid'] for x in data['results'])
+            after = data['next']
+        self.assertEqual(pmids, list(Article.objects.order_by('pmid').values_list('pmid', flat=True)))
+
+    def test_limit_must_be_positive(self):
+        response = self.client.get(reverse('core:article_list'), {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class PicUniqTest(SimpleTestCase):
+
+    def test_dedup_beyond_the_variable_limit(self):
+        conn = sqlite3.connect(':memory:')
+        self.addCleanup(conn.close)
+        # Stock SQLite builds allow 32766 variables; more duplicates than that fit in one window here
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        conn.execute('create table pubmed (pmid integer, title text, abstract text, source text)')
+        conn.executemany('insert into pubmed values (?, ?, ?, ?)',
+                         [(x, 'old', f'abstract {x}', 'pubmed19n0001.xml.gz') for x in range(1, 5001)]
+                         + [(x, 'new', None, 'pubmed19n0002.xml.gz') for x in range(1, 5001)])
+        self.assertEqual(pic_uniq.dedup(conn), (5000, 5000))
+        rows = conn.execute('select pmid, title, abstract from pubmed order by pmid').fetchall()
+        self.assertEqual(rows, [(x, 'new', f'abstract {x}') for x in range(1, 5001)])
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('articles/', views.article_list, name='article_list'),
+    path('articles/batch/', views.article_batch, name='article_batch'),
+    path('articles/<int:pmid>/', views.article_detail, name='article_detail'),
+]
@@ -1,3 +1,121 @@
-from django.shortcuts import render
+import datetime
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_GET
+
+from .models import Article
+
+FIELDS = ('pmid', 'journal', 'pubdate', 'volume', 'issue', 'title', 'page', 'author', 'language')
+MAX_LIMIT = 1000
+MAX_BATCH = 1000
+
+api_cache = cache_page(settings.API_CACHE_TIMEOUT, cache=settings.API_CACHE_ALIAS)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def fields_for(request):
+    """Field projection: the abstract is only loaded with ?abstract=1."""
+    if request.GET.get('abstract') in ('1', 'true'):
+        return FIELDS + ('abstract',)
+    return FIELDS
+
+
+def to_dict(article, fields):
+    data = {x: getattr(article, x) for x in fields}
+    data['pubdate'] = data['pubdate'].isoformat()
+    return data
+
+
+def int_param(request, name, default=None, minimum=0, maximum=None):
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f'{name} must be an integer')
+    if value < minimum:
+        raise BadRequest(f'{name} must be at least {minimum}')
+    return min(value, maximum) if maximum else value
+
+
+def date_param(request, name):
+    value = request.GET.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f'{name} must be a YYYY-MM-DD date')
+
+
+@require_GET
+@api_cache
+def article_detail(request, pmid):
+    fields = fields_for(request)
+    article = Article.objects.only(*fields).filter(pmid=pmid).first()
+    if article is None:
+        return error(f'pmid {pmid} not found', status=404)
+    return JsonResponse(to_dict(article, fields))
+
+
+@require_GET
+@api_cache
+def article_batch(request):
+    """Look up ?pmids=1,2,3; pmids that don't exist are listed under missing."""
+    try:
+        pmids = [int(x) for x in request.GET.get('pmids', '').split(',') if x.strip()]
+    except ValueError:
+        return error('pmids must be a comma separated list of integers')
+    if not pmids:
+        return error('pmids is required')
+    if len(pmids) > MAX_BATCH:
+        return error(f'at most {MAX_BATCH} pmids per request')
+    fields = fields_for(request)
+    found = {x.pmid: to_dict(x, fields) for x in Article.objects.only(*fields).filter(pmid__in=pmids)}
+    return JsonResponse({
+        'results': [found[x] for x in pmids if x in found],
+        'missing': [x for x in pmids if x not in found],
+    })
+
+
+@require_GET
+@api_cache
+def article_list(request):
+    """Filter by journal, date range and language, paged by pmid.
+
+    Pages are keyset based: pass the returned next cursor as ?after= to get
+    the following page, which costs the same however deep it is.
+    """
+    try:
+        after = int_param(request, 'after', default=0)
+        limit = int_param(request, 'limit', default=100, minimum=1, maximum=MAX_LIMIT)
+        date_from = date_param(request, 'date_from')
+        date_to = date_param(request, 'date_to')
+    except BadRequest as e:
+        return error(str(e))
+    fields = fields_for(request)
+    queryset = Article.objects.only(*fields).filter(pmid__gt=after)
+    if request.GET.get('journal'):
+        queryset = queryset.filter(journal=request.GET['journal'])
+    if request.GET.get('language'):
+        queryset = queryset.filter(language=request.GET['language'])
+    if date_from:
+        queryset = queryset.filter(pubdate__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(pubdate__lte=date_to)
+    articles = list(queryset.order_by('pmid')[:limit + 1])
+    next_after = articles[limit - 1].pmid if len(articles) > limit else None
+    return JsonResponse({
+        'results': [to_dict(x, fields) for x in articles[:limit]],
+        'next': next_after,
+    })
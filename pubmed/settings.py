@@ -74,14 +74,59 @@ WSGI_APPLICATION = 'pubmed.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
+# SQLite by default; PUBMED_DB_ENGINE=postgresql switches to PostgreSQL,
+# where the ingest path bulk loads with COPY (see core.bulk).
+
+DB_ENGINE = os.environ.get('PUBMED_DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PUBMED_DB_NAME', 'pubmed'),
+            'USER': os.environ.get('PUBMED_DB_USER', ''),
+            'PASSWORD': os.environ.get('PUBMED_DB_PASSWORD', ''),
+            'HOST': os.environ.get('PUBMED_DB_HOST', ''),
+            'PORT': os.environ.get('PUBMED_DB_PORT', ''),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('PUBMED_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
+    }
+
+# Applied on every new SQLite connection, see core.signals
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -262144,  # in KiB, i.e. 256MB
+    'temp_store': 'MEMORY',
+}
+
 
-DATABASES = {
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# The read-only API caches whole responses in API_CACHE_ALIAS. Switch it to
+# 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION
+# directory to share the cache between worker processes.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pubmed-api',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = 300  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -0,0 +1,102 @@
+"""Byte streams for (gzipped) PubMed XML, inflated ahead of the parser.
+
+open_xml(path) returns a binary file object for iter_elements: no text
+decoding happens here, expat reads the bytes as they are. gzip members are
+inflated with isal or zlib-ng when installed (both several times faster
+than zlib), falling back to the stdlib gzip module, and in a background
+thread that stays up to `buffers` blocks ahead of the reader. Inflating
+releases the GIL, so it overlaps with parsing instead of adding to it.
+"""
+import gzip
+import queue
+import threading
+
+try:
+    from isal import igzip as fast_gzip
+except ImportError:
+    try:
+        from zlib_ng import gzip_ng as fast_gzip
+    except ImportError:
+        fast_gzip = None
+
+GZIP = fast_gzip or gzip
+BACKEND = GZIP.__name__
+
+
+class ThreadedReader(object):
+    """Read f in a background thread, keeping at most `buffers` blocks in memory."""
+
+    def __init__(self, f, block_size=1 << 20, buffers=4):
+        self.f = f
+        self.block_size = block_size
+        self.blocks = queue.Queue(buffers)
+        self.block = b''
+        self.offset = 0
+        self.eof = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        try:
+            while not self.closed.is_set():
+                data = self.f.read(self.block_size)
+                self.put(data)
+                if not data:
+                    return
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        # Time out now and then so close() can stop a thread blocked on a full queue
+        while not self.closed.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def next_block(self):
+        item = self.blocks.get()
+        if isinstance(item, Exception):
+            raise item
+        if not item:
+            self.eof = True
+        self.block, self.offset = item, 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self.block[self.offset:]]
+            while not self.eof:
+                self.next_block()
+                parts.append(self.block)
+            self.block, self.offset = b'', 0
+            return b''.join(parts)
+        while self.offset >= len(self.block) and not self.eof:
+            self.next_block()
+        # Short reads are fine for the parser and save joining blocks
+        data = self.block[self.offset:self.offset + size]
+        self.offset += len(data)
+        return data
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_xml(path, threaded=True, block_size=1 << 20, buffers=4):
+    """Open a .xml or .xml.gz file as a binary stream of XML bytes."""
+    if str(path).endswith('.gz'):
+        f = GZIP.open(path, 'rb')
+    else:
+        f = open(path, 'rb')
+    if threaded:
+        return ThreadedReader(f, block_size=block_size, buffers=buffers)
+    return f
@@ -0,0 +1,175 @@
+"""Declarative field extraction shared by core's Parser and utility/pmparser.py.
+
+FIELDS maps a path under MedlineCitation to a result field plus an optional
+normaliser. compile_fields turns the table into a single generated function
+that descends every shared path prefix once per record, instead of walking
+``info.get('Article', {}).get('Journal', {})...`` from the root per field.
+"""
+
+month_map = {
+    'Jan': '1',
+    'Feb': '2',
+    'Mar': '3',
+    'Apr': '4',
+    'May': '5',
+    'Jun': '6',
+    'Jul': '7',
+    'Aug': '8',
+    'Sep': '9',
+    'Oct': '10',
+    'Nov': '11',
+    'Dec': '12'
+}
+
+
+def text(value):
+    if isinstance(value, dict):
+        return value.get('#text')
+    return value
+
+
+def pmid(value):
+    value = text(value)
+    return int(value) if value else 0
+
+
+def month(value):
+    return month_map.get(value)
+
+
+def abstract(value):
+    if isinstance(value, list):
+        return ' '.join(x for x in map(text, value) if x)
+    return text(value)
+
+
+def first_initials(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        return value.get('Initials')
+    return None
+
+
+def join_list(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    return value or ''
+
+
+def as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def affiliation(value):
+    parts = (text(x.get('Affiliation')) for x in as_list(value) if isinstance(x, dict))
+    return '; '.join(x for x in parts if x) or None
+
+
+def author_list(value):
+    """[(last name, fore name, initials, affiliation)] in author order."""
+    authors = []
+    for x in as_list(value):
+        if not isinstance(x, dict):
+            continue
+        last = text(x.get('LastName')) or text(x.get('CollectiveName'))
+        if last:
+            authors.append((last, text(x.get('ForeName')) or '', text(x.get('Initials')) or '',
+                            affiliation(x.get('AffiliationInfo'))))
+    return authors
+
+
+def mesh_list(value):
+    """[(descriptor UI, descriptor name)]."""
+    headings = []
+    for x in as_list(value):
+        descriptor = x.get('DescriptorName') if isinstance(x, dict) else None
+        if isinstance(descriptor, dict) and descriptor.get('@UI'):
+            headings.append((descriptor['@UI'], descriptor.get('#text') or ''))
+    return headings
+
+
+def keyword_list(value):
+    """Distinct keywords of every KeywordList, in order."""
+    keywords = {}
+    for group in as_list(value):
+        if isinstance(group, dict):
+            for x in as_list(group.get('Keyword')):
+                x = text(x)
+                if x:
+                    keywords.setdefault(x.strip(), None)
+    return list(keywords)
+
+
+JOURNAL_ISSUE = ('Article', 'Journal', 'JournalIssue')
+
+FIELDS = (
+    ('pmid', ('PMID',), pmid),
+    ('journal', ('Article', 'Journal', 'Title'), None),
+    ('issue', JOURNAL_ISSUE + ('Issue',), None),
+    ('volume', JOURNAL_ISSUE + ('Volume',), None),
+    ('pubyear', JOURNAL_ISSUE + ('PubDate', 'Year'), None),
+    ('pubmonth', JOURNAL_ISSUE + ('PubDate', 'Month'), month),
+    ('pubday', JOURNAL_ISSUE + ('PubDate', 'Day'), None),
+    ('title', ('Article', 'ArticleTitle'), text),
+    ('page', ('Article', 'Pagination', 'MedlinePgn'), None),
+    ('abstract', ('Article', 'Abstract', 'AbstractText'), abstract),
+    ('author', ('Article', 'AuthorList', 'Author'), first_initials),
+    ('language', ('Article', 'Language'), join_list),
+)
+
+# Only core stores these, in the Author, MeshHeading and Keyword tables
+RELATED_FIELDS = (
+    ('authors', ('Article', 'AuthorList', 'Author'), author_list),
+    ('mesh', ('MeshHeadingList', 'MeshHeading'), mesh_list),
+    ('keywords', ('KeywordList',), keyword_list),
+)
+
+
+def compile_fields(fields):
+    """Compile (name, path, normaliser) specs into ``extract(node) -> dict``.
+
+    The table is turned into the source of one straight-line function with
+    a local per path node, so shared prefixes are looked up once. Missing
+    paths produce ``normaliser(None)``, so every field is always present.
+    """
+    tree = {}
+    env = {'_dict': dict}
+    lines = ['def extract(node):']
+    for i, (name, path, normaliser) in enumerate(fields):
+        node = tree
+        for key in path[:-1]:
+            node = node.setdefault(key, ({}, []))[0]
+        node.setdefault(path[-1], ({}, []))[1].append(i)
+        env[f'norm{i}'] = normaliser
+        env[f'default{i}'] = normaliser(None) if normaliser else None
+        lines.append(f'    value{i} = default{i}')
+
+    counter = [0]
+
+    def emit(node, parent, indent):
+        pad = '    ' * indent
+        for key, (children, leaves) in node.items():
+            counter[0] += 1
+            var = f'node{counter[0]}'
+            lines.append(f'{pad}{var} = {parent}.get({key!r})')
+            if leaves:
+                lines.append(f'{pad}if {var} is not None:')
+                for i in leaves:
+                    call = f'norm{i}({var})' if env[f'norm{i}'] else var
+                    lines.append(f'{pad}    value{i} = {call}')
+            if children:
+                lines.append(f'{pad}if isinstance({var}, _dict):')
+                emit(children, var, indent + 1)
+
+    lines.append('    if isinstance(node, _dict):')
+    emit(tree, 'node', 2)
+    lines.append('    return {' + ', '.join(f'{name!r}: value{i}' for i, (name, _, _) in enumerate(fields)) + '}')
+    exec('\n'.join(lines), env)
+    return env['extract']
+
+
+extract_citation = compile_fields(FIELDS)
+extract_article = compile_fields(FIELDS + RELATED_FIELDS)
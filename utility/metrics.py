@@ -0,0 +1,143 @@
+"""Per-file, per-stage metrics for the ingest pipeline.
+
+Stages nest: time spent in an inner stage (e.g. ``decompress`` while
+``parse`` pulls bytes) is only counted for the inner one, so the stage
+totals add up to the file's wall time even though the pipeline is a chain
+of generators.
+"""
+import cProfile
+import json
+import resource
+import time
+
+
+def peak_rss():
+    """Peak resident set size of this process in KiB (Linux units)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Stage(object):
+    __slots__ = ('metrics', 'name')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.metrics.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.metrics.exit()
+
+
+class FileMetrics(object):
+    def __init__(self, name, profile=None):
+        self.name = name
+        self.stages = {}
+        self.stack = []
+        self.profile = profile
+        self.profiler = cProfile.Profile() if profile else None
+
+    def _counters(self, name):
+        counters = self.stages.get(name)
+        if counters is None:
+            counters = self.stages[name] = {'wall': 0.0, 'cpu': 0.0, 'items': 0,
+                                            'rows': 0, 'bytes': 0, 'peak_rss_kb': 0}
+        return counters
+
+    def _pause(self, now, cpu):
+        name, wall_start, cpu_start = self.stack[-1]
+        counters = self._counters(name)
+        counters['wall'] += now - wall_start
+        counters['cpu'] += cpu - cpu_start
+
+    def enter(self, name):
+        now, cpu = time.perf_counter(), time.process_time()
+        if self.stack:
+            self._pause(now, cpu)
+        self.stack.append([name, now, cpu])
+        if name == self.profile:
+            self.profiler.enable()
+
+    def exit(self):
+        now, cpu = time.perf_counter(), time.process_time()
+        self._pause(now, cpu)
+        name = self.stack.pop()[0]
+        if name == self.profile:
+            self.profiler.disable()
+        if self.stack:
+            self.stack[-1][1:] = [now, cpu]
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def iter(self, name, iterable):
+        """Yield from iterable, timing each next() and counting items as stage name."""
+        it = iter(iterable)
+        counters = self._counters(name)
+        while True:
+            self.enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                counters['peak_rss_kb'] = max(counters['peak_rss_kb'], peak_rss())
+                return
+            finally:
+                self.exit()
+            counters['items'] += 1
+            yield item
+
+    def add(self, name, **values):
+        counters = self._counters(name)
+        for key, value in values.items():
+            counters[key] += value
+        counters['peak_rss_kb'] = max(counters['peak_rss_kb'], peak_rss())
+
+    def merge(self, other):
+        """Fold in the stages another process measured for the same file."""
+        for name, values in other.stages.items():
+            counters = self._counters(name)
+            for key, value in values.items():
+                counters[key] = max(counters[key], value) if key == 'peak_rss_kb' else counters[key] + value
+
+    def dump_profile(self, path):
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
+
+    def to_dict(self, **extra):
+        stages = {}
+        for name, values in self.stages.items():
+            values = dict(values, wall=round(values['wall'], 4), cpu=round(values['cpu'], 4))
+            if values['items'] and values['wall']:
+                values['items_per_sec'] = round(values['items'] / values['wall'], 1)
+            stages[name] = values
+        wall = sum(values['wall'] for values in self.stages.values())
+        result = {'file': self.name, 'wall': round(wall, 4), 'peak_rss_kb': peak_rss(), 'stages': stages}
+        result.update(extra)
+        return result
+
+    def write(self, path, **extra):
+        """Append one JSON line; extra keys such as article or row totals are added as is."""
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.to_dict(**extra)) + '\n')
+
+    def __getstate__(self):
+        # cProfile objects don't pickle; pool workers dump their own profile
+        state = self.__dict__.copy()
+        state['profiler'] = None
+        return state
+
+
+class MeteredReader(object):
+    """File wrapper counting bytes and time spent in read() as a stage."""
+
+    def __init__(self, f, metrics, name='decompress'):
+        self.f = f
+        self.metrics = metrics
+        self.name = name
+
+    def read(self, size=-1):
+        with self.metrics.stage(self.name):
+            data = self.f.read(size)
+        self.metrics.add(self.name, bytes=len(data))
+        return data
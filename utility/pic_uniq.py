@@ -1,30 +1,85 @@
+"""Remove duplicate pmids from a pmparser db in place.
+
+    python utility/pic_uniq.py pubmed.db [chunk_size]
+
+For every pmid the newest version is kept: the row from the last source
+file in filename order (pubmed19n0002 updates pubmed19n0001), and within
+one file the first row, as core's Parser does. A kept row without an
+abstract takes the newest abstract one of its duplicates has, the rule
+Parser.update_none_field applies. The table is walked in pmid ranges with
+a commit after each, so the db stays usable while this runs. Given a table
+of pmids, only those are checked, e.g. the rows just merged into a large db.
+"""
+import logging
 import sqlite3
-import os
+import sys
+
+logger = logging.getLogger('main')
+
+
+def newest(row):
+    rowid, source = row[0], row[1]
+    return (source or '', -rowid)
+
+
+def duplicates(pmids=None):
+    """SQL selecting the duplicated pmids in [?, ?), among those in the table pmids if given."""
+    if pmids is None:
+        return 'select pmid from pubmed where pmid >= ? and pmid < ? group by pmid having count(*) > 1'
+    return (f'select pmid from {pmids} where pmid >= ? and pmid < ? '
+            f'and (select count(*) from pubmed where pubmed.pmid = {pmids}.pmid) > 1')
 
 
-# create new db
-if os.path.exists('uniq.db'):
-    os.remove('uniq.db')
-conn2 = sqlite3.connect('uniq.db')
-c2 = conn2.cursor()
-c2.execute('''CREATE TABLE pubmed
-              (pmid INTEGER UNIQ, journal TEXT, pubdate TEXT, page TEXT, volume TEXT, issue TEXT, title TEXT, abstract TEXT, author TEXT, language TEXT)''')
+def dedup_range(cursor, low, high, pmids=None):
+    """Dedup pmids in [low, high); return (rows deleted, abstracts filled)."""
+    # A subquery rather than bound pmids: a window can hold more duplicates than SQLite allows variables
+    cursor.execute(f'select rowid, source, pmid, abstract is not null from pubmed '
+                   f'where pmid in ({duplicates(pmids)})', (low, high))
+    groups = {}
+    for row in cursor.fetchall():
+        groups.setdefault(row[2], []).append(row)
 
+    delete, fill = [], []
+    for rows in groups.values():
+        rows.sort(key=newest, reverse=True)
+        keep = rows[0]
+        if not keep[3]:
+            donor = next((x for x in rows[1:] if x[3]), None)
+            if donor is not None:
+                fill.append((donor[0], keep[0]))
+        delete.extend((x[0],) for x in rows[1:])
+    # Fill first: the donors are among the rows about to be deleted
+    cursor.executemany('update pubmed set abstract = (select abstract from pubmed where rowid = ?) where rowid = ?',
+                       fill)
+    cursor.executemany('delete from pubmed where rowid = ?', delete)
+    return len(delete), len(fill)
 
-# fetch data from old db
-conn1 = sqlite3.connect('pubmed3.db')
-c1 = conn1.cursor()
-sql = 'select * from pubmed group by pmid'
-c1.execute(sql)
 
-# store data to new db
-rows = 1
-while rows:
-    rows = c1.fetchmany(size=100000)
-    c2.executemany('''insert into pubmed values (?,?,?,?,?,?,?,?,?,?)''', [tuple(x) for x in rows])
-    conn2.commit()
+def dedup(conn, chunk_size=100000, pmids=None):
+    cursor = conn.cursor()
+    cursor.execute('create index if not exists pubmed_pmid on pubmed (pmid)')
+    conn.commit()
+    low, high = cursor.execute(f'select min(pmid), max(pmid) from {pmids or "pubmed"}').fetchone()
+    if low is None:
+        return 0, 0
+    deleted = filled = 0
+    for start in range(low, high + 1, chunk_size):
+        d, f = dedup_range(cursor, start, start + chunk_size, pmids)
+        conn.commit()
+        deleted += d
+        filled += f
+        if d:
+            logger.info(f'pmid {start}-{start + chunk_size - 1}: deleted {d}, filled {f} abstracts')
+    return deleted, filled
 
-conn1.close()
-conn2.close()
 
-    
\ No newline at end of file
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s  %(levelname)s %(message)s', level=logging.INFO)
+    try:
+        chunk_size = int(sys.argv[2])
+    except IndexError as e:
+        chunk_size = 100000
+    conn = sqlite3.connect(sys.argv[1])
+    deleted, filled = dedup(conn, chunk_size)
+    conn.close()
+    logger.info(f'Deleted {deleted} duplicate rows, filled {filled} abstracts')
@@ -1,14 +1,32 @@
 import xmltodict
-import gzip
+import itertools
 import json
 import sqlite3
-import collections
 import glob
 import os
 import sys
-from multiprocessing import dummy, Pool, Manager
+from multiprocessing import Pool, Queue
+from queue import Empty
 import logging
 import hashlib
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utility.decompress import open_xml
+from utility.extract import extract_citation
+from utility.pic_uniq import dedup
+from utility.xmlstream import element_to_dict, iter_elements
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
 
 logger = logging.getLogger('main')
 logger.setLevel(logging.INFO)  # 必须有
@@ -25,39 +43,41 @@ sth.setFormatter(fmt)
 logger.addHandler(h)
 logger.addHandler(sth)
 
+INSERT_SQL = ('insert into pubmed (pmid, journal, pubdate, page, volume, issue, title, abstract, author, language, source) '
+              'values (?,?,?,?,?,?,?,?,?,?,?)')
+COPY_SQL = 'COPY pubmed (pmid, journal, pubdate, page, volume, issue, title, abstract, author, language, source) FROM STDIN'
+
+# Article.to_iter order; pubdate stays the 'YYYY' / 'YYYY-MM' text the db gets
+PARQUET_SCHEMA = pa.schema([
+    ('pmid', pa.int64()), ('journal', pa.string()), ('pubdate', pa.string()), ('page', pa.string()),
+    ('volume', pa.string()), ('issue', pa.string()), ('title', pa.string()), ('abstract', pa.string()),
+    ('author', pa.string()), ('language', pa.string()),
+]) if pa else None
 
 
 
-class Article(object):
-    def __init__(self, pmid=None, journal=None, pubyear=None, pubmonth=None, language=None,
-                 page=None, volume=None, issue=None, title=None, abstract=None, author=None):
+
+class Article(namedtuple('Article', 'pmid journal pubdate page volume issue title abstract author language')):
+    """One citation in INSERT_SQL column order, a tuple without a per-instance __dict__."""
+    __slots__ = ()
+
+    @classmethod
+    def from_info(cls, pmid=None, journal=None, pubyear=None, pubmonth=None, language=None,
+                  page=None, volume=None, issue=None, title=None, abstract=None, author=None):
         if pmid is None:
             raise ValueError('PMID cannot be null')
-        self.pmid = pmid
-        self.journal = journal
-        self.pubyear = pubyear
-        self.pubmonth = pubmonth
-        self.page = page
-        self.volume = volume
-        self.issue = issue
-        self.title = title
-        self.abstract = abstract
-        self.author = author
-        self.language = language
-        if self.pubyear and self.pubmonth:
-            self.pubdate = self.pubyear + '-' + self.pubmonth.zfill(2)
-        elif self.pubyear:
-            self.pubdate = self.pubyear
+        if pubyear and pubmonth:
+            pubdate = pubyear + '-' + pubmonth.zfill(2)
+        elif pubyear:
+            pubdate = pubyear
         else:
-            self.pubdate = None
-        
-    
+            pubdate = None
+        return cls(pmid, journal, pubdate, page, volume, issue, title, abstract, author, language)
+
     def to_dict(self):
         return {
             'PMID': self.pmid,
             'Journal': self.journal,
-            # 'PubYear': self.pubyear,
-            # 'PubMonth': self.pubmonth,
             'PubDate': self.pubdate,
             'Page': self.page,
             'Volume': self.volume,
@@ -67,194 +87,451 @@ class Article(object):
             'Author': self.author,
             'Language': self.language
         }
-    
+
     def to_iter(self):
-        res = (self.pmid, self.journal, self.pubdate, self.page, self.volume, self.issue, self.title, self.abstract, self.author, self.language)
-        #return tuple(map(str, res))
-        return res
+        # A plain tuple pickles onto the worker queue without a per-row Article.__new__ call
+        return tuple(self)
 
 
-class Pmparse(object):
-    month_map = {
-        'Jan': '1',
-        'Feb': '2',
-        'Mar': '3',
-        'Apr': '4',
-        'May': '5',
-        'Jun': '6',
-        'Jul': '7',
-        'Aug': '8',
-        'Sep': '9',
-        'Oct': '10',
-        'Nov': '11',
-        'Dec': '12'
-    }
-    def __init__(self, indir, dbfile=None, process=10, test=False):
-        self.process = int(process)
+# Set in every pool worker by init_worker; the queue must be inherited, not pickled
+worker_queue = None
 
-        self.infs = glob.glob(indir + '/*.xml.gz')
 
-        if test:
-            logger.info('Start test mode')
-            self.infs = self.infs[:30]
+def init_worker(queue):
+    global worker_queue
+    worker_queue = queue
 
-        self.dbfile = dbfile
 
-        logger.info(f'Total file {len(self.infs)}')
+def iter_batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
 
-        self.total_count = Manager().list()
 
-        
+def calc_md5(file, chunk_size=1 << 20):
+    hashobj = hashlib.md5()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hashobj.update(chunk)
+    return hashobj.hexdigest()
 
-        p = Pool(self.process)
-        logger.info(f'Start pool {self.process}')
-        p.map_async(self.parse_to_db, self.infs, callback=print, error_callback=print)
-        p.close()
-        p.join()
-        
 
-        # init db
+class SqliteOutput(object):
+    """All files into one SQLite db, written by the main process only.
+
+    Workers put row batches on a bounded queue and collect() inserts them
+    while parsing goes on. A full queue blocks the workers, so memory stays
+    bounded by queue_size * batch_size rows. Files whose (name, md5, size)
+    are already in the signature table are skipped unless fresh is set.
+    """
+    def __init__(self, dbfile, fresh=False):
+        self.dbfile = dbfile
         logger.info('init db')
-        self.db_init()
+        self.db_init(fresh)
 
-        self.total_to_db()
-        # close db
-        self.conn.close()
-        logger.info(f'Total count {len(self.total_count)}')  
-        
-    def parse_to_db(self, f):
-        logger.info(f'Start parse {f}')
-        try:
-            xml_text = self.read_file(f)
-            xml_dict = self.parse_to_dict(xml_text)
-            iter_result = self.extract_info_to_iter(xml_dict)
-            #self.to_db(iter_result)
-            self.total_count += iter_result
-        except Exception as e:
-            logger.error(f'{f} error')
-    
-    def db_init(self):
-        if os.path.exists(self.dbfile):
+    def __getstate__(self):
+        # Workers get a copy of the output, never the writer's connection
+        state = self.__dict__.copy()
+        state.pop('conn', None)
+        state.pop('cursor', None)
+        return state
+
+    def db_init(self, fresh=False):
+        if fresh and os.path.exists(self.dbfile):
             os.remove(self.dbfile)
         self.conn = sqlite3.connect(self.dbfile)
         self.cursor = self.conn.cursor()
         try:
-            self.cursor.execute('''CREATE TABLE pubmed 
+            self.cursor.execute('''CREATE TABLE pubmed
             (pmid INTEGER UNIQ, journal TEXT, pubdate TEXT, page TEXT, volume TEXT, issue TEXT, title TEXT, abstract TEXT, author TEXT, language TEXT, source TEXT)
             ''')
             self.cursor.execute('''CREATE TABLE signature
             (name TEXT UNIQ, md5 TEXT, size INTEGER)''')
+            self.cursor.execute('CREATE INDEX pubmed_source ON pubmed (source)')
             self.conn.commit()
         except sqlite3.OperationalError:
             pass
 
-    def read_file(self, file):
-        with gzip.open(file, 'rt') as f:
-            xml_text = f.read()
-        logger.info('Read file done!')
-        return xml_text
-    
-    def filter_oldfile(self):
-        self.db_init()
-        self.cursor.execute('select * from signature')
-        rows = self.cursor.fetchall()
-        files = {x['name']: x['md5'] for x in row}
-        self.infs = [x for x in self.infs if x in files and files[x] == ]
-        for x in self.infs:
-            if x in files:
+    def pending(self, infs):
+        """Drop input files already loaded, hashing only those whose name and size match."""
+        self.cursor.execute('select name, md5, size from signature')
+        files = {name: (md5, size) for name, md5, size in self.cursor.fetchall()}
+        todo = []
+        for x in infs:
+            old = files.get(os.path.basename(x))
+            size = os.path.getsize(x)
+            if old is None or old[1] != size or old[0] != calc_md5(x):
+                todo.append(x)
+        return todo
+
+    def write_file(self, path, rows, batch_size):
+        """Worker side: hand the rows of one input file to collect()."""
+        name = os.path.basename(path)
+        count = 0
+        for batch in iter_batches(rows, batch_size):
+            worker_queue.put(('rows', name, batch))
+            count += len(batch)
+        worker_queue.put(('done', name, calc_md5(path), os.path.getsize(path), count))
+        return count
+
+    def failed(self, path, error):
+        worker_queue.put(('error', os.path.basename(path), str(error)))
+
+    def to_db(self, iter_result, source=None):
+        self.insert(source, iter_result)
+        self.conn.commit()
+
+    def delete_source(self, name):
+        self.cursor.execute('delete from pubmed where source = ?', (name,))
+
+    def insert(self, name, rows):
+        self.cursor.executemany(INSERT_SQL, (x + (name,) for x in rows))
+
+    def save_signature(self, name, md5, size):
+        self.cursor.execute('delete from signature where name = ?', (name,))
+        self.cursor.execute('insert into signature values (?,?,?)', (name, md5, size))
+
+    def collect(self, queue, result, pending):
+        """Write row batches from the workers until every file reported back.
+
+        A file's old rows are removed before its first batch, and its
+        signature is written in the transaction that commits its last one.
+        A file that fails part way has the rows it already sent removed
+        again, so only complete files are counted and kept.
+        """
+        started = {}
+        total_count = 0
+        while pending:
+            try:
+                kind, name, *payload = queue.get(timeout=5)
+            except Empty:
+                if result.ready():
+                    logger.error(f'Workers exited with {pending} file unreported')
+                    break
+                continue
+            if kind == 'rows':
+                if name not in started:
+                    started[name] = 0
+                    self.delete_source(name)
+                rows = payload[0]
+                self.insert(name, rows)
+                started[name] += len(rows)
+            elif kind == 'done':
+                md5, size, count = payload
+                self.save_signature(name, md5, size)
+                self.conn.commit()
+                total_count += started.pop(name, 0)
+                logger.info(f'Saved {name}: {count}')
+                pending -= 1
+            else:
+                self.delete_source(name)
+                self.conn.commit()
+                started.pop(name, None)
+                logger.error(f'Skip {name}: {payload[0]}')
+                pending -= 1
+        for name in started:
+            self.delete_source(name)
+        self.conn.commit()
+        return total_count
+
+    def close(self):
+        self.conn.close()
 
 
+class PostgresOutput(SqliteOutput):
+    """SqliteOutput's single writer against PostgreSQL; dbfile is a connection URI.
+
+    Row batches are streamed in with COPY FROM STDIN instead of INSERTs.
+    pubmed has no unique key (pic_uniq resolves duplicates), so a file is
+    merged by deleting its old rows and copying the new ones within one
+    transaction, and no staging table is needed.
+    """
+    def db_init(self, fresh=False):
+        if psycopg is None:
+            raise ImportError('PostgreSQL output needs psycopg: pip install psycopg')
+        self.conn = psycopg.connect(self.dbfile)
+        self.cursor = self.conn.cursor()
+        if fresh:
+            self.cursor.execute('DROP TABLE IF EXISTS pubmed, signature')
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS pubmed
+        (pmid INTEGER, journal TEXT, pubdate TEXT, page TEXT, volume TEXT, issue TEXT, title TEXT, abstract TEXT, author TEXT, language TEXT, source TEXT)
+        ''')
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS signature
+        (name TEXT PRIMARY KEY, md5 TEXT, size BIGINT)''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS pubmed_source ON pubmed (source)')
+        self.conn.commit()
+
+    def delete_source(self, name):
+        self.cursor.execute('delete from pubmed where source = %s', (name,))
+
+    def insert(self, name, rows):
+        with self.cursor.copy(COPY_SQL) as copy:
+            for x in rows:
+                copy.write_row(x + (name,))
+
+    def save_signature(self, name, md5, size):
+        self.cursor.execute('delete from signature where name = %s', (name,))
+        self.cursor.execute('insert into signature values (%s,%s,%s)', (name, md5, size))
+
+
+class ShardedOutput(SqliteOutput):
+    """One SQLite shard per input file, written by the worker, merged into dbfile.
+
+    Workers write <dbfile>.shards/<name>.db with the db_init schema, so
+    inserting scales with the process count. collect() then merges every
+    complete shard in filename order, ATTACH and one INSERT ... SELECT each,
+    and runs pic_uniq's dedup over the merged pmids only. Into an empty db
+    the pubmed indexes are dropped and built once after the merge; into a
+    loaded one they are kept, as updating them for one day's files costs
+    far less than rebuilding them. Rows are sorted by pmid within a shard,
+    so the table is in pmid order as far as the input files are. Shards
+    left by a run that died before merging are picked up by the next one.
+    """
+    INDEXES = {
+        'pubmed_source': 'CREATE INDEX IF NOT EXISTS pubmed_source ON pubmed (source)',
+        'pubmed_pmid': 'CREATE INDEX IF NOT EXISTS pubmed_pmid ON pubmed (pmid)',
+    }
+
+    def __init__(self, dbfile, fresh=False):
+        super().__init__(dbfile, fresh)
+        self.shard_dir = dbfile + '.shards'
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+    def shard_path(self, path):
+        return os.path.join(self.shard_dir, os.path.basename(path) + '.db')
+
+    def write_file(self, path, rows, batch_size):
+        name = os.path.basename(path)
+        shard = self.shard_path(path)
+        tmp = shard + '.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        # A shard is scratch until renamed, so it needs neither a journal nor fsync
+        out = SqliteOutput(tmp)
+        out.cursor.execute('PRAGMA journal_mode = OFF')
+        out.cursor.execute('PRAGMA synchronous = OFF')
+        out.cursor.execute('DROP INDEX pubmed_source')
+        count = 0
+        for batch in iter_batches(rows, batch_size):
+            out.insert(name, batch)
+            count += len(batch)
+        out.save_signature(name, calc_md5(path), os.path.getsize(path))
+        out.conn.commit()
+        out.close()
+        os.replace(tmp, shard)
+        logger.info(f'Saved shard {name}: {count}')
+        return count
+
+    def failed(self, path, error):
+        pass
+
+    def collect(self, queue, result, pending):
+        total_count = sum(x or 0 for x in result.get())
+        self.merge()
+        return total_count
+
+    def merge(self):
+        shards = sorted(glob.glob(os.path.join(self.shard_dir, '*.db')))
+        if not shards:
+            return
+        logger.info(f'Merge {len(shards)} shards')
+        # Old rows go while pubmed_source still exists to find them
+        for shard in shards:
+            name = os.path.basename(shard)[:-len('.db')]
+            self.delete_source(name)
+            self.cursor.execute('delete from signature where name = ?', (name,))
+        self.conn.commit()
+        rebuild = self.cursor.execute('SELECT 1 FROM pubmed LIMIT 1').fetchone() is None
+        if rebuild:
+            for name in self.INDEXES:
+                self.cursor.execute(f'DROP INDEX IF EXISTS {name}')
+        self.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS merged_pmid (pmid INTEGER PRIMARY KEY)')
+        self.cursor.execute('DELETE FROM merged_pmid')
+        try:
+            for shard in shards:
+                self.cursor.execute('ATTACH DATABASE ? AS shard', (shard,))
+                self.cursor.execute('INSERT INTO pubmed SELECT * FROM shard.pubmed ORDER BY pmid')
+                self.cursor.execute('INSERT OR IGNORE INTO merged_pmid SELECT pmid FROM shard.pubmed')
+                self.cursor.execute('INSERT INTO signature SELECT * FROM shard.signature')
+                self.conn.commit()
+                self.cursor.execute('DETACH DATABASE shard')
+                os.remove(shard)
+        finally:
+            for sql in self.INDEXES.values():
+                self.cursor.execute(sql)
+            self.conn.commit()
+        deleted, filled = dedup(self.conn, pmids='merged_pmid')
+        logger.info(f'Merged, removed {deleted} duplicate rows, filled {filled} abstracts')
+
+    def close(self):
+        super().close()
+        if os.path.isdir(self.shard_dir) and not os.listdir(self.shard_dir):
+            os.rmdir(self.shard_dir)
+
+
+class ParquetOutput(object):
+    """One Parquet file per input, written by the worker that parsed it.
+
+    Nothing is shared between workers, so conversion scales with the
+    process count. Each file is written under a temporary name and renamed
+    once complete; inputs whose .parquet is newer than the input are
+    skipped unless fresh is set.
+    """
+    def __init__(self, outdir, fresh=False):
+        if pq is None:
+            raise ImportError('Parquet output needs pyarrow: pip install pyarrow')
+        self.outdir = outdir
+        self.fresh = fresh
+        os.makedirs(outdir, exist_ok=True)
+
+    def out_path(self, path):
+        name = os.path.basename(path)
+        for ext in ('.gz', '.xml'):
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+        return os.path.join(self.outdir, name + '.parquet')
+
+    def pending(self, infs):
+        if self.fresh:
+            return list(infs)
+        todo = []
+        for x in infs:
+            out = self.out_path(x)
+            if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(x):
+                todo.append(x)
+        return todo
+
+    def write_file(self, path, rows, batch_size):
+        out = self.out_path(path)
+        tmp = out + '.tmp'
+        count = 0
+        try:
+            with pq.ParquetWriter(tmp, PARQUET_SCHEMA, compression='zstd') as writer:
+                for batch in iter_batches(rows, batch_size):
+                    columns = [list(c) for c in zip(*batch)]
+                    writer.write_batch(pa.record_batch(columns, schema=PARQUET_SCHEMA))
+                    count += len(batch)
+            os.replace(tmp, out)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        logger.info(f'Saved {os.path.basename(out)}: {count}')
+        return count
+
+    def failed(self, path, error):
+        pass
+
+    def collect(self, queue, result, pending):
+        return sum(x or 0 for x in result.get())
+
+    def close(self):
+        pass
+
+
+OUTPUTS = {'sqlite': SqliteOutput, 'sharded': ShardedOutput, 'postgresql': PostgresOutput,
+           'parquet': ParquetOutput}
+
+
+class Pmparse(object):
+    """Parse a directory of PubMed .xml.gz files with a pool of workers.
+
+    output picks where the rows go: 'sqlite' loads every file into the
+    SQLite db dbfile (SqliteOutput), 'sharded' does so through one shard
+    db per file (ShardedOutput), 'parquet' writes one Parquet file per
+    input into the directory dbfile (ParquetOutput). A postgresql:// URI
+    as dbfile selects PostgresOutput.
+    """
+    def __init__(self, indir, dbfile=None, process=10, test=False, fresh=False,
+                 batch_size=10000, queue_size=None, output='sqlite'):
+        self.process = int(process)
+        self.batch_size = batch_size
+        self.queue_size = queue_size or 2 * self.process
+
+        self.infs = sorted(glob.glob(indir + '/*.xml.gz'))
+
+        if test:
+            logger.info('Start test mode')
+            self.infs = self.infs[:30]
+
+        self.dbfile = dbfile
+        if output == 'sqlite' and str(dbfile).startswith(('postgres://', 'postgresql://')):
+            output = 'postgresql'
+        self.output = OUTPUTS[output](dbfile, fresh)
+        infs = self.output.pending(self.infs)
+        logger.info(f'Skip {len(self.infs) - len(infs)} parsed file')
+        self.infs = infs
+
+        logger.info(f'Total file {len(self.infs)}')
+
+        queue = Queue(self.queue_size)
+        p = Pool(self.process, initializer=init_worker, initargs=(queue,))
+        logger.info(f'Start pool {self.process}')
+        try:
+            result = p.map_async(self.parse_to_db, self.infs, error_callback=print)
+            p.close()
+            self.total_count = self.output.collect(queue, result, len(self.infs))
+        finally:
+            p.terminate()
+            p.join()
+        self.output.close()
+        logger.info(f'Total count {self.total_count}')
+
+    def parse_to_db(self, f):
+        logger.info(f'Start parse {f}')
+        try:
+            iter_result = (x.to_iter() for x in self.extract_articles(self.iter_articles(f)))
+            return self.output.write_file(f, iter_result, self.batch_size)
+        except Exception as e:
+            logger.error(f'{f} error: {e}')
+            self.output.failed(f, e)
+
+    def iter_articles(self, file):
+        """Stream the PubmedArticle records of file, one dict at a time."""
+        with open_xml(file) as f:
+            for elem in iter_elements(f):
+                if elem.tag == 'PubmedArticle':
+                    yield element_to_dict(elem)
+
+    def read_file(self, file):
+        with open_xml(file) as f:
+            xml_bytes = f.read()
+        logger.info('Read file done!')
+        return xml_bytes
     
     def parse_to_dict(self, xml_text):
         xml_dict = xmltodict.parse(xml_text)
         logger.info('Parse to dict done!')
         return xml_dict
     
-    def to_db(self, iter_result):
-        # self.cursor.executemany("insert into pubmed values (?,?,?,?,?,?,?,?,?,?)", self.iter_result)
-        for x in iter_result:
-            # self.total_count.append(0)
-            try:
-                self.cursor.execute("insert into pubmed values (?,?,?,?,?,?,?,?,?,?)", x)
-            except Exception as e:
-                logger.info(e)
-                logger.info(x)
-                raise(e)      
-        self.conn.commit()
-    
-    def total_to_db(self):
-        total = len(self.total_count)
-        batch_size = 100000
-        x = 0
-        while x <= total:
-            logger.info(f'Save {x} -- {x +batch_size}')
-            try:
-                self.cursor.executemany("insert into pubmed values (?,?,?,?,?,?,?,?,?,?)", self.total_count[x: x+batch_size])
-            except Exception as e:
-                logger.info(e)
-                logger.info(x)    
-            self.conn.commit()
-            x += batch_size
-    
     def extract_info_to_dict(self, xml_dict):
-        dict_result = [x.to_dict() for x in self.extract_info(xml_dict)]
-        return dict_result
+        return (x.to_dict() for x in self.extract_info(xml_dict))
 
     def extract_info_to_iter(self, xml_dict):
-        iter_result = [x.to_iter() for x in self.extract_info(xml_dict)]
-        return iter_result
-    
+        return (x.to_iter() for x in self.extract_info(xml_dict))
+
     def extract_info(self, xml_dict):
-        container = []
-        article_set = xml_dict.get('PubmedArticleSet', {}).get('PubmedArticle', {})
+        article_set = xml_dict.get('PubmedArticleSet', {}).get('PubmedArticle', [])
+        if isinstance(article_set, dict):
+            article_set = [article_set]
         logger.info(f'Total {len(article_set)}')
+        return self.extract_articles(article_set)
+
+    def extract_articles(self, article_set):
+        """Yield an Article per PubmedArticle; nothing is collected, the writer consumes them as they come."""
         count = 0
         for article in article_set:
             count += 1
             if count % 1000 == 0:
                 logger.info(f'Processing {count}')
-            container.append(self.select_info_to_obj(article))
-        return container
-        
+            yield self.select_info_to_obj(article)
 
     def select_info_to_obj(self, pubarticle):
-        info = pubarticle.get('MedlineCitation', {})
-        pmid = info.get('PMID', {}).get('#text')
-        if pmid:
-            pmid = int(pmid)
-        else:
-            pmid = 0
-        journal = info.get('Article', {}).get('Journal', {}).get( 'Title')
-        issue = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Issue')
-        volume = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('Volume')
-        pubyear = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Year')
-        month = info.get('Article', {}).get('Journal', {}).get('JournalIssue', {}).get('PubDate', {}).get('Month')
-        pubmonth = self.month_map.get(month)
-        title = info.get('Article', {}).get('ArticleTitle')
-        if type(title) == collections.OrderedDict:
-            title = title.get('#text')
-        page = info.get('Article', {}).get('Pagination', {}).get('MedlinePgn')
-        abstract = info.get('Article', {}).get('Abstract', {}).get('AbstractText')
-        if type(abstract) == list:
-            temp_list = [x.get('#text', str(x)) for x in abstract if type(x) == collections.OrderedDict]
-            abstract = ' '.join(temp_list)
-        elif type(abstract) == collections.OrderedDict:
-            abstract = abstract.get('#text')
-
-        author = info.get('Article', {}).get('AuthorList', {}).get('Author', [{}])
-        if type(author) == list:
-            if len(author) > 0:
-                author = author[0].get('Initials')
-        elif type(author) == dict or type(author) == collections.OrderedDict:
-            # logger.info(author)
-            author = author.get('Initials')
-
-        language = info.get('Article', {}).get('Language', '')
-        if type(language) == list:
-            language = ','.join(language)
-        article = Article(pmid=pmid,journal=journal,issue=issue, volume=volume, pubyear=pubyear, 
-                          pubmonth=pubmonth, title=title, page=page, abstract=abstract, author=author, language=language)
-        return article
+        info = extract_citation(pubarticle.get('MedlineCitation'))
+        del info['pubday']
+        return Article.from_info(**info)
 
     
 
@@ -269,4 +546,13 @@ if __name__ == '__main__':
     except IndexError as e:
         process = 10
     process = int(process)
-    Pmparse(sys.argv[1], dbfile=sys.argv[2], process=process, test=test)
+    try:
+        fresh = sys.argv[5]
+    except IndexError as e:
+        fresh = False
+    fresh = True if str(fresh).lower() == 'true' else False
+    try:
+        output = sys.argv[6]
+    except IndexError as e:
+        output = 'sqlite'
+    Pmparse(sys.argv[1], dbfile=sys.argv[2], process=process, test=test, fresh=fresh, output=output)
@@ -0,0 +1,50 @@
+"""Incremental parsing of PubmedArticleSet files.
+
+iter_elements pulls the top-level records out of a byte stream with
+iterparse and drops each one once it has been handed out. element_to_dict
+turns a record into the same layout xmltodict.parse builds ('@attr' keys,
+'#text', lists for repeated tags), so utility.extract works on either,
+without serialising the element back to XML and parsing it a second time.
+"""
+from xml.etree import ElementTree
+
+
+def element_to_dict(elem):
+    node = {'@' + key: value for key, value in elem.attrib.items()}
+    text = elem.text or ''
+    for child in elem:
+        value = element_to_dict(child)
+        if child.tail:
+            text += child.tail
+        existing = node.get(child.tag, node)
+        if existing is node:
+            node[child.tag] = value
+        elif isinstance(existing, list):
+            existing.append(value)
+        else:
+            node[child.tag] = [existing, value]
+    text = text.strip()
+    if not node:
+        return text or None
+    if text:
+        node['#text'] = text
+    return node
+
+
+def iter_elements(f):
+    """Yield each direct child of the root element of the XML byte stream f.
+
+    Elements are only complete while the caller holds them; the tree is
+    cleared before the next one is read, so memory stays flat.
+    """
+    context = ElementTree.iterparse(f, events=('start', 'end'))
+    _, root = next(context)
+    depth = 1
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem
+            root.clear()